@@ -0,0 +1,98 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import faiss
+from indexing import EmbeddingPool, build_combined_content
+from rag import COMBINED_CONTENT_TEMPLATE, INDEX_TYPES, build_faiss_index, set_search_params
+
+DEFAULT_CSV = Path(__file__).parent.parent / 'data' / 'Product_Information_Dataset.csv'
+
+# Query-time sweeps per index type
+SWEEPS = {
+    'flat': [{}],
+    'ivf_flat': [{"nprobe": n} for n in (1, 4, 16, 64)],
+    'ivf_sq8': [{"nprobe": n} for n in (1, 4, 16, 64)],
+    'ivf_pq': [{"nprobe": n} for n in (1, 4, 16, 64)],
+    'hnsw': [{"ef_search": e} for e in (16, 32, 64, 128)],
+}
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    """Fraction of the exact top-k that the approximate search also returned"""
+    k = truth.shape[1]
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def measure(index, queries: np.ndarray, k: int):
+    """Per-query latency (single-query calls, as the assistant issues them) and results"""
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, positions = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = positions[0]
+    return found, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k versus latency of ProductRAG index types against the flat index")
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=500, help="Product titles sampled as queries")
+    parser.add_argument('--index-types', nargs='+', default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    texts = build_combined_content(df, COMBINED_CONTENT_TEMPLATE).tolist()
+    rng = np.random.default_rng(0)
+    query_texts = df['title'].astype(str).sample(min(args.queries, len(df)), random_state=0).tolist()
+    with EmbeddingPool(workers=args.workers) as pool:
+        vectors = pool.embed(texts)
+        queries = pool.embed(query_texts)
+        print(f"Embedded catalog: {pool.stats}")
+    # Perturb queries slightly so they are not exact catalog matches
+    queries = queries + rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    report = []
+    for index_type in args.index_types:
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, index_type)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        for params in SWEEPS[index_type]:
+            set_search_params(index, **params)
+            found, p50, p99 = measure(index, queries, args.k)
+            row = {
+                "index_type": index_type,
+                **params,
+                f"recall@{args.k}": round(recall_at_k(truth, found), 4),
+                "p50_ms": round(p50, 4),
+                "p99_ms": round(p99, 4),
+                "build_s": round(build_seconds, 2),
+                "index_bytes": len(faiss.serialize_index(index)),
+            }
+            report.append(row)
+            print(row)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
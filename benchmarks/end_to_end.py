@@ -0,0 +1,254 @@
+"""
+End-to-end latency benchmark for the assistant, runnable offline.
+
+The mock API runs in-process on a local port and Gemini is replaced by
+FakeChatModel with a configurable latency, so results are repeatable and cost
+nothing. Reported: cold start, per-stage latency (routing, embedding, FAISS,
+hybrid search, HTTP, LLM), per-turn latency and TTFT by query kind, throughput
+under concurrency and peak RSS. Results are written as JSON; pass --compare
+with an earlier result to see what changed between commits.
+
+    python benchmarks/end_to_end.py --llm-latency-ms 300 --concurrency 8
+    python benchmarks/end_to_end.py --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT / 'src'))
+
+from telemetry import telemetry
+
+DEFAULT_CORPUS = Path(__file__).parent / 'queries.json'
+RESULTS_DIR = Path(__file__).parent / 'results'
+PRIORITIES = ["low", "medium", "critical"]
+
+
+def percentiles(latencies_ms):
+    if not latencies_ms:
+        return {"calls": 0}
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "calls": len(latencies_ms),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextmanager
+def working_directory(path: Path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def start_mock_api() -> str:
+    """Serve mock_api from a background thread on a free local port; returns its /data/ URL"""
+    import uvicorn
+
+    mock_dir = ROOT / 'mock_api'
+    sys.path.append(str(mock_dir))
+    # mock_api loads its dataset from a path relative to its own directory
+    with working_directory(mock_dir):
+        import mock_api
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/data/"
+
+
+def stage_latencies(engine, corpus, iterations: int):
+    """Each stage of a turn measured on its own"""
+    queries = [turn for conversation in corpus for turn in conversation["turns"]]
+    customer_ids = ["37077", "50437", "48328", "28105", "41066"]
+    stages = defaultdict(list)
+    rag = engine.rag
+    for _ in range(iterations):
+        for query in queries:
+            stages["embedding"].append(timed(rag._embed_query, query)[1])
+            rag.embed_query(query)
+            # Embedding is cached by now, so these measure the index work alone
+            stages["routing"].append(timed(engine.router.route, query)[1])
+            stages["faiss"].append(timed(rag.search, query, 50)[1])
+            stages["hybrid_search"].append(timed(engine.searcher.search, query, 5)[1])
+        for customer_id in customer_ids:
+            stages["http_customer"].append(timed(engine.order_api.get_order_by_id, customer_id)[1])
+        for priority in PRIORITIES:
+            stages["http_priority"].append(timed(engine.order_api.get_order_by_priority, priority)[1])
+        stages["llm"].append(timed(engine.llm.invoke, "Hello")[1])
+    return {stage: percentiles(values) for stage, values in stages.items()}
+
+
+def run_conversation(engine, conversation):
+    """Fresh session per conversation; one record per turn"""
+    from chatbot.core import EcommerceAssistant
+
+    assistant = EcommerceAssistant(engine=engine)
+    records = []
+    for turn in conversation["turns"]:
+        done = None
+        for event in assistant.stream_query(turn):
+            if event["type"] == "done":
+                done = event
+        records.append({"kind": conversation["kind"], "ttft_ms": done["ttft_ms"], "total_ms": done["total_ms"]})
+    return records, assistant.route_stats()
+
+
+def end_to_end(engine, corpus):
+    by_kind = defaultdict(lambda: {"total": [], "ttft": []})
+    routes = defaultdict(int)
+    for conversation in corpus:
+        records, route_counts = run_conversation(engine, conversation)
+        for record in records:
+            by_kind[record["kind"]]["total"].append(record["total_ms"])
+            if record["ttft_ms"] is not None:
+                by_kind[record["kind"]]["ttft"].append(record["ttft_ms"])
+        for route, count in route_counts.items():
+            routes[route] += count
+    return {
+        "by_kind": {
+            kind: {"turn": percentiles(values["total"]), "ttft": percentiles(values["ttft"])}
+            for kind, values in by_kind.items()
+        },
+        "routes": dict(routes),
+    }
+
+
+def throughput(engine, corpus, concurrency: int, rounds: int):
+    conversations = corpus * rounds
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda c: run_conversation(engine, c)[0], conversations))
+    elapsed = time.perf_counter() - start
+    turns = [record for records in results for record in records]
+    return {
+        "concurrency": concurrency,
+        "turns": len(turns),
+        "seconds": round(elapsed, 2),
+        "turns_per_second": round(len(turns) / elapsed, 2),
+        "turn": percentiles([r["total_ms"] for r in turns]),
+    }
+
+
+def flatten(report, prefix=""):
+    items = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def compare(report, baseline_path: Path):
+    baseline = flatten(json.loads(baseline_path.read_text()))
+    current = flatten(report)
+    print(f"\nChanges against {baseline_path}:")
+    for name, value in current.items():
+        before = baseline.get(name)
+        if before is None or before == value or name.startswith("config."):
+            continue
+        change = f"{(value - before) / before:+.1%}" if before else "new"
+        print(f"  {name:50s} {before:>10} -> {value:<10} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, type=Path)
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0)
+    parser.add_argument('--token-delay-ms', type=float, default=5.0)
+    parser.add_argument('--iterations', type=int, default=5, help="Passes over the corpus for the stage timings")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=2, help="Passes over the corpus for the throughput run")
+    parser.add_argument('--output', default=None, type=Path, help="Defaults to benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', default=None, type=Path, help="Earlier result to compare against")
+    args = parser.parse_args()
+
+    corpus = json.loads(args.corpus.read_text())["conversations"]
+    os.environ["MOCK_API_URL"] = start_mock_api()
+
+    (core, import_ms) = timed(__import__, "chatbot.core", fromlist=["AssistantEngine"])
+    from chatbot.fake_llm import FakeChatModel
+
+    llm = FakeChatModel(latency_ms=args.llm_latency_ms, token_delay_ms=args.token_delay_ms)
+    engine, engine_ms = timed(core.AssistantEngine, llm=llm)
+    _, session_ms = timed(core.EcommerceAssistant, engine=engine)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "llm_latency_ms": args.llm_latency_ms,
+            "token_delay_ms": args.token_delay_ms,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "rounds": args.rounds,
+            "conversations": len(corpus),
+        },
+        "cold_start": {
+            "import_ms": round(import_ms, 1),
+            "engine_ms": round(engine_ms, 1),
+            "session_ms": round(session_ms, 2),
+            "engine_stages_ms": engine.status()["timings_ms"],
+        },
+        "stages": stage_latencies(engine, corpus, args.iterations),
+        "end_to_end": end_to_end(engine, corpus),
+        "throughput": throughput(engine, corpus, args.concurrency, args.rounds),
+        "llm_calls": llm.calls,
+        # Span timings recorded by the instrumentation during all of the above
+        "spans": telemetry.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(json.dumps(report, indent=2))
+    output = args.output or RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
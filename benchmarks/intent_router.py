@@ -0,0 +1,100 @@
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from chatbot.router import IntentRouter
+from rag import ProductRAG
+
+# (query, expected tool); None means the query should be left to the agent
+CORPUS = [
+    ("What is the status of my order? (ID: 37077)", "get_order"),
+    ("status of order 37077", "get_order"),
+    ("customer 41791 orders", "get_order"),
+    ("Can you look up order number 12345 for me", "get_order"),
+    ("where is my purchase 64288", "get_order"),
+    ("my id is 37077, when did I order?", "get_order"),
+    ("show critical priority orders", "get_orders_by_priority"),
+    ("list all high priority orders", "get_orders_by_priority"),
+    ("which orders are medium priority?", "get_orders_by_priority"),
+    ("orders with priority: low", "get_orders_by_priority"),
+    ("how many critical orders are there", "get_orders_by_priority"),
+    ("What are the best-rated guitars?", "search_products"),
+    ("Show me the most popular microphone", "search_products"),
+    ("recommend headphones under $100", "search_products"),
+    ("I need a cheap electric guitar for a beginner", "search_products"),
+    ("do you sell drum sticks", "search_products"),
+    ("find a usb audio interface with 4+ stars", "search_products"),
+    ("hello!", None),
+    ("thanks, that's all", None),
+    ("I don't know the date of my recent order", None),
+    ("is the second one cheaper?", None),
+    ("tell me more about that guitar", None),
+    ("what is your return policy", None),
+    ("compare them for me", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing accuracy and latency of the intent router")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--repeat', type=int, default=20, help="Timed passes over the corpus")
+    parser.add_argument('--rules-only', action='store_true', help="Skip the embedding classifier")
+    parser.add_argument('--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    embed_fn = None
+    if not args.rules_only:
+        rag = ProductRAG(model_name=args.model)
+        # Uncached, so the timings include the query embedding
+        embed_fn = rag._embed_query
+    start = time.perf_counter()
+    router = IntentRouter(embed_fn=embed_fn)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    correct = 0
+    sources = Counter()
+    mistakes = []
+    for query, expected in CORPUS:
+        route = router.route(query)
+        sources[route.source] += 1
+        if route.tool == expected:
+            correct += 1
+        else:
+            mistakes.append({"query": query, "expected": expected, "routed": route.tool,
+                             "intent": route.intent, "confidence": round(route.confidence, 3)})
+
+    latencies = []
+    for _ in range(args.repeat):
+        for query, _ in CORPUS:
+            t0 = time.perf_counter()
+            router.route(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    direct = sum(1 for _, expected in CORPUS if expected is not None)
+    report = {
+        "queries": len(CORPUS),
+        "accuracy": round(correct / len(CORPUS), 3),
+        "expected_direct": direct,
+        "routed_by": dict(sources),
+        "setup_ms": round(setup_ms, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mistakes": mistakes,
+    }
+    print(f"accuracy {report['accuracy']:.1%} over {len(CORPUS)} queries, routed by {dict(sources)}")
+    print(f"route latency p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms (setup {report['setup_ms']} ms)")
+    for mistake in mistakes:
+        print(f"  miss: {mistake}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
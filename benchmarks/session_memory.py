@@ -0,0 +1,69 @@
+import argparse
+import gc
+import json
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from chatbot.core import AssistantEngine, EcommerceAssistant
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def simulate_conversation(assistant: EcommerceAssistant, turns: int):
+    """Fill the session's memory as a chat of the given length would, without calling the LLM"""
+    for i in range(turns):
+        assistant.memory.add_user(f"What is the status of my order? (ID: {37000 + i})")
+        assistant.memory.add_ai("Your order was placed on 2018-01-02 and has shipped. " * 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of the shared engine versus each additional session")
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--turns', type=int, default=10, help="Simulated turns per session")
+    parser.add_argument('--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    rss_start = rss_mb()
+    # Sessions are built and filled but never call the LLM, so no API key is needed
+    engine = AssistantEngine(llm=FakeListChatModel(responses=["ok"]))
+    rss_engine = rss_mb()
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    sessions = []
+    for _ in range(args.sessions):
+        assistant = EcommerceAssistant(engine=engine)
+        simulate_conversation(assistant, args.turns)
+        sessions.append(assistant)
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_session_kb = (after - before) / args.sessions / 1024
+    report = {
+        "engine_rss_mb": round(rss_engine - rss_start, 1),
+        "sessions": args.sessions,
+        "turns_per_session": args.turns,
+        "per_session_kb": round(per_session_kb, 1),
+        "sessions_total_mb": round((after - before) / 1024 / 1024, 2),
+        "peak_traced_mb": round(peak / 1024 / 1024, 2),
+        "rss_mb": round(rss_mb(), 1),
+    }
+    print(f"engine: {report['engine_rss_mb']} MB RSS, loaded once per process")
+    print(f"session: {report['per_session_kb']} KB each over {args.sessions} sessions of {args.turns} turns")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Startup cost of the assistant: import time of chatbot.core (in a fresh
+interpreter, so nothing is already cached), time until order questions can be
+answered and time until product search is ready.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --importtime   # also list the slowest imports
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / 'src'
+sys.path.append(str(SRC))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import chatbot.core; print((time.perf_counter() - t) * 1000)"
+
+
+def import_ms(repeat: int) -> list:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    return [
+        float(subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], env=env, text=True).strip().splitlines()[-1])
+        for _ in range(repeat)
+    ]
+
+
+def slowest_imports(limit: int = 15) -> list:
+    """Cumulative import time per module from python -X importtime"""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import chatbot.core"],
+                            env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            rows.append((int(parts[1]) / 1000, parts[2]))
+    return [{"module": name, "cumulative_ms": ms} for ms, name in sorted(rows, reverse=True)[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters to time the import in")
+    parser.add_argument('--importtime', action='store_true')
+    parser.add_argument('--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    imports = import_ms(args.repeat)
+
+    from chatbot.core import AssistantEngine
+    from chatbot.fake_llm import FakeChatModel
+
+    start = time.perf_counter()
+    engine = AssistantEngine(llm=FakeChatModel(latency_ms=0), background=True)
+    orders_ready_ms = (time.perf_counter() - start) * 1000
+    engine.wait_ready()
+    if engine.warmup_error:
+        raise engine.warmup_error
+
+    report = {
+        "import_ms": {"min": round(min(imports), 1), "max": round(max(imports), 1)},
+        "orders_ready_ms": round(orders_ready_ms, 1),
+        "products_ready_ms": round(engine.timings["ready_ms"], 1),
+        "engine_stages_ms": engine.status()["timings_ms"],
+    }
+    if args.importtime:
+        report["slowest_imports"] = slowest_imports()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
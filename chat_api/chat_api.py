@@ -0,0 +1,212 @@
+import asyncio
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from chatbot.core import AssistantEngine, EcommerceAssistant
+from telemetry import instrument_fastapi, register_gauge
+
+# Conversations answered at once; each holds a worker thread for its tool and LLM calls
+MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", "8"))
+# Requests allowed to wait for a slot before new ones are turned away with 429
+MAX_QUEUED = int(os.getenv("CHAT_MAX_QUEUED", "32"))
+SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL", "1800"))
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+# When set, Gemini is replaced by the offline FakeChatModel with this latency (load tests)
+FAKE_LLM_LATENCY_MS = os.getenv("CHAT_FAKE_LLM_MS")
+
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    response: str
+    total_ms: float
+
+
+class Session:
+    """
+    One conversation: its assistant and a lock so its turns run one at a time.
+    The assistant is built on the first turn, on a worker thread.
+    """
+
+    def __init__(self, assistant: Optional[EcommerceAssistant] = None):
+        self.assistant = assistant
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """Per-conversation state keyed by session ID, expired after a period of inactivity"""
+
+    def __init__(self, engine: AssistantEngine, ttl_seconds: int = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, Session] = {}
+
+    def get(self, session_id: Optional[str]):
+        """(session ID, session), creating the session if it does not exist"""
+        self.expire()
+        if session_id and session_id in self.sessions:
+            session = self.sessions[session_id]
+        else:
+            if len(self.sessions) >= self.max_sessions:
+                raise HTTPException(status_code=429, detail="Too many active sessions", headers={"Retry-After": "60"})
+            session_id = session_id or uuid.uuid4().hex
+            session = self.sessions[session_id] = Session()
+        session.last_used = time.monotonic()
+        return session_id, session
+
+    def new_assistant(self) -> EcommerceAssistant:
+        return EcommerceAssistant(engine=self.engine)
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for session_id in [s for s, session in self.sessions.items()
+                           if session.last_used < cutoff and not session.lock.locked()]:
+            del self.sessions[session_id]
+
+    def delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+
+class Limiter:
+    """
+    Bounded concurrency with a bounded wait queue. Requests beyond
+    max_concurrent + max_queued are rejected immediately rather than piling up.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.pending = 0
+        self.active = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.pending >= self.max_concurrent + self.max_queued:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Assistant is busy, retry shortly", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            async with self.semaphore:
+                self.active += 1
+                try:
+                    yield
+                finally:
+                    self.active -= 1
+        finally:
+            self.pending -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return self.active
+
+    @property
+    def queued(self) -> int:
+        return self.pending - self.in_flight
+
+
+def default_engine() -> AssistantEngine:
+    if FAKE_LLM_LATENCY_MS:
+        from chatbot.fake_llm import FakeChatModel
+
+        return AssistantEngine(llm=FakeChatModel(latency_ms=float(FAKE_LLM_LATENCY_MS)), background=True)
+    # Product search warms up in the background; order questions are served meanwhile
+    return AssistantEngine(background=True)
+
+
+def create_app(
+    engine_factory: Callable[[], AssistantEngine] = default_engine,
+    max_concurrent: int = MAX_CONCURRENT,
+    max_queued: int = MAX_QUEUED,
+) -> FastAPI:
+    """
+    Build the chat service. engine_factory is called once at startup; pass one
+    that injects a stub LLM to load-test without Gemini.
+    """
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # The engine loads the model and FAISS index; keep that off the event loop
+        engine = await asyncio.to_thread(engine_factory)
+        state["engine"] = engine
+        state["sessions"] = SessionStore(engine)
+        state["limiter"] = Limiter(max_concurrent, max_queued)
+        register_gauge("chat_sessions", lambda: len(state["sessions"].sessions))
+        register_gauge("chat_in_flight", lambda: state["limiter"].in_flight)
+        register_gauge("chat_queued", lambda: state["limiter"].queued)
+        register_gauge("chat_rejected_total", lambda: state["limiter"].rejected)
+        state["executor"] = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="assistant")
+        yield
+        state["executor"].shutdown(wait=False)
+
+    app = FastAPI(title="E-commerce Assistant API", description="Chat with the e-commerce assistant", lifespan=lifespan)
+    instrument_fastapi(app, service="chat_api")
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest):
+        """Answer a message in the given conversation, starting a new one if session_id is omitted"""
+        if not request.message.strip():
+            raise HTTPException(status_code=400, detail="Message must not be empty")
+        session_id, session = state["sessions"].get(request.session_id)
+        start = time.perf_counter()
+        # Take the session's lock first, so turns queued behind it do not hold a slot other sessions could use
+        async with session.lock:
+            async with state["limiter"].slot():
+                if session.assistant is None:
+                    loop = asyncio.get_running_loop()
+                    session.assistant = await loop.run_in_executor(state["executor"], state["sessions"].new_assistant)
+                response = await session.assistant.aprocess_query(request.message, executor=state["executor"])
+        return ChatResponse(session_id=session_id, response=response, total_ms=(time.perf_counter() - start) * 1000)
+
+    @app.delete("/sessions/{session_id}")
+    async def end_session(session_id: str):
+        if not state["sessions"].delete(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        return {"deleted": session_id}
+
+    @app.get("/sessions/{session_id}/stats")
+    async def session_stats(session_id: str):
+        session = state["sessions"].sessions.get(session_id)
+        if session is None or session.assistant is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        assistant = session.assistant
+        return {"latency": assistant.latency_stats(), "routes": assistant.route_stats(), "memory": assistant.memory_stats()}
+
+    @app.get("/health")
+    async def health():
+        if "limiter" not in state:
+            return JSONResponse(status_code=503, content={"status": "starting"})
+        limiter = state["limiter"]
+        return {
+            "status": "ok" if state["engine"].is_ready else "warming_up",
+            "engine": state["engine"].status(),
+            "sessions": len(state["sessions"].sessions),
+            "in_flight": limiter.in_flight,
+            "queued": limiter.queued,
+            "rejected": limiter.rejected,
+        }
+
+    return app
+
+
+app = create_app()
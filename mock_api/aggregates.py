@@ -0,0 +1,180 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ("Sales", "Profit", "Shipping_Cost", "Quantity", "Discount")
+DIMENSIONS = ("Product_Category", "Gender", "Order_Priority", "Device_Type", "Customer_Login_type", "Payment_method")
+DATE_COLUMN = "Order_Date"
+STATS = ("sum", "count", "min", "max")
+
+# Group-bys kept up to date on every append and answered without touching the cube
+DEFAULT_ROLLUPS = ((), ("Product_Category",), ("Gender",))
+
+SUM, COUNT, MIN, MAX = range(4)
+
+
+class AggregateStore:
+    """
+    Sum, count, min and max of the order measures, computed once at load time and
+    updated incrementally as rows are appended.
+
+    Two structures are maintained:
+    - rollups: fixed group-bys (total, by category, by gender) served directly
+    - a cube of cells keyed by every dimension plus the order date, from which any
+      other group-by or date range is rolled up without rescanning the orders
+
+    Every group maps to an array of shape (len(measures), 4) holding sum, count,
+    min and max per measure.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        dimensions: Sequence[str] = DIMENSIONS,
+        measures: Sequence[str] = MEASURES,
+        rollups: Iterable[Tuple[str, ...]] = DEFAULT_ROLLUPS,
+    ):
+        self.dimensions = [d for d in dimensions if d in df.columns]
+        self.measures = [m for m in measures if m in df.columns]
+        self.rollups: Dict[Tuple[str, ...], Dict[tuple, np.ndarray]] = {tuple(r): {} for r in rollups}
+        self.cells: Dict[tuple, np.ndarray] = {}
+        self._cells_frame: Optional[pd.DataFrame] = None
+        self.rows = 0
+        self.append(df)
+
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        frame = pd.DataFrame(index=df.index)
+        for dimension in self.dimensions:
+            frame[dimension] = df[dimension].astype(object).fillna("").astype(str)
+        dates = pd.to_datetime(df[DATE_COLUMN], errors="coerce") if DATE_COLUMN in df.columns else pd.NaT
+        frame[DATE_COLUMN] = pd.Series(dates, index=df.index).dt.strftime("%Y-%m-%d").fillna("")
+        for measure in self.measures:
+            frame[measure] = pd.to_numeric(df[measure], errors="coerce")
+        return frame
+
+    def _grouped(self, frame: pd.DataFrame, keys: List[str]) -> Iterable[Tuple[tuple, np.ndarray]]:
+        """(group key, stats array) pairs for the rows in frame"""
+        if not keys:
+            stats = frame[self.measures].agg(list(STATS)).T.to_numpy(dtype=np.float64)
+            return [((), stats)]
+        grouped = frame.groupby(keys, sort=False)[self.measures].agg(list(STATS))
+        values = grouped.to_numpy(dtype=np.float64).reshape(len(grouped), len(self.measures), len(STATS))
+        group_keys = [k if isinstance(k, tuple) else (k,) for k in grouped.index]
+        return zip(group_keys, values)
+
+    @staticmethod
+    def _merge(target: Dict[tuple, np.ndarray], groups: Iterable[Tuple[tuple, np.ndarray]]):
+        for key, stats in groups:
+            current = target.get(key)
+            if current is None:
+                target[key] = stats.copy()
+                continue
+            current[:, SUM] += stats[:, SUM]
+            current[:, COUNT] += stats[:, COUNT]
+            current[:, MIN] = np.fmin(current[:, MIN], stats[:, MIN])
+            current[:, MAX] = np.fmax(current[:, MAX], stats[:, MAX])
+
+    def append(self, df: pd.DataFrame):
+        """Fold new order rows into every rollup and the cube; cost grows with len(df) only"""
+        self.apply(self.prepare(df))
+
+    def prepare(self, df: pd.DataFrame) -> Tuple[int, List[list], list]:
+        """
+        Group new rows without touching the store. Everything that can fail happens
+        here, so callers can stage an append and apply it once other stores have succeeded.
+        """
+        if df.empty:
+            return 0, [], []
+        frame = self._normalize(df)
+        rollups = [list(self._grouped(frame, list(keys))) for keys in self.rollups]
+        cells = list(self._grouped(frame, self.dimensions + [DATE_COLUMN]))
+        return len(df), rollups, cells
+
+    def apply(self, prepared: Tuple[int, List[list], list]):
+        rows, rollups, cells = prepared
+        if not rows:
+            return
+        for target, groups in zip(self.rollups.values(), rollups):
+            self._merge(target, groups)
+        self._merge(self.cells, cells)
+        self._cells_frame = None
+        self.rows += rows
+
+    def _measure_index(self, measure: str) -> int:
+        if measure not in self.measures:
+            raise ValueError(f"Unknown measure '{measure}'. Available: {', '.join(self.measures)}")
+        return self.measures.index(measure)
+
+    def rollup(self, measure: str, by: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """Precomputed group-by; by must be one of the registered rollups"""
+        m = self._measure_index(measure)
+        groups = self.rollups[tuple(by)]
+        return [self._record(by, key, stats[m]) for key, stats in sorted(groups.items())]
+
+    def query(
+        self,
+        measure: str,
+        by: Sequence[str] = (),
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Sum, count, mean, min and max of measure grouped by any dimensions and
+        restricted to an inclusive YYYY-MM-DD date range
+        """
+        by = list(by)
+        unknown = [d for d in by if d not in self.dimensions]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {', '.join(unknown)}. Available: {', '.join(self.dimensions)}")
+        if start_date is None and end_date is None and tuple(by) in self.rollups:
+            return self.rollup(measure, by)
+
+        self._measure_index(measure)
+        cells = self._frame()
+        mask = np.ones(len(cells), dtype=bool)
+        if start_date is not None:
+            mask &= (cells[DATE_COLUMN] >= start_date).to_numpy()
+        if end_date is not None:
+            mask &= (cells[DATE_COLUMN] <= end_date).to_numpy()
+        selected = cells.loc[mask]
+        columns = [f"{measure}_{stat}" for stat in STATS]
+        if not by:
+            groups = [((), selected[columns])]
+        else:
+            groups = selected.groupby(by, sort=True)[columns]
+        result = []
+        for key, group in groups:
+            stats = np.array([
+                group[columns[SUM]].sum(),
+                group[columns[COUNT]].sum(),
+                group[columns[MIN]].min(),
+                group[columns[MAX]].max(),
+            ])
+            result.append(self._record(by, key if isinstance(key, tuple) else (key,), stats))
+        return result
+
+    def _frame(self) -> pd.DataFrame:
+        """The cube as a columnar frame, rebuilt lazily after appends"""
+        if self._cells_frame is None:
+            keys = list(self.cells)
+            frame = pd.DataFrame(keys, columns=self.dimensions + [DATE_COLUMN])
+            stats = np.stack([self.cells[k] for k in keys]) if keys else np.empty((0, len(self.measures), 4))
+            for i, measure in enumerate(self.measures):
+                for j, stat in enumerate(STATS):
+                    frame[f"{measure}_{stat}"] = stats[:, i, j]
+            self._cells_frame = frame
+        return self._cells_frame
+
+    @staticmethod
+    def _record(by: Sequence[str], key: tuple, stats: np.ndarray) -> Dict[str, Any]:
+        record: Dict[str, Any] = dict(zip(by, key))
+        count = int(stats[COUNT])
+        record.update({
+            "sum": float(stats[SUM]),
+            "count": count,
+            "mean": float(stats[SUM] / count) if count else None,
+            "min": None if np.isnan(stats[MIN]) else float(stats[MIN]),
+            "max": None if np.isnan(stats[MAX]) else float(stats[MAX]),
+        })
+        return record
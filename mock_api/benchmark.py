@@ -0,0 +1,141 @@
+"""
+Latency benchmark for the order lookups behind the mock API.
+
+In-process mode (default) compares the original full-frame scans with the
+OrderStore indexes on the same workload:
+
+    python benchmark.py --iterations 200
+
+HTTP mode load-tests a running server with concurrent clients:
+
+    python benchmark.py --url http://127.0.0.1:8000 --concurrency 16
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from order_store import OrderStore
+
+DATASET_PATH = "../data/Order_Data_Dataset.csv"
+PRIORITIES = ["low", "medium", "high", "critical"]
+
+
+def scan_customer(df, customer_id):
+    return df[df["Customer_Id"] == customer_id].to_dict(orient="records")
+
+
+def scan_category(df, category):
+    return df[df["Product_Category"].str.contains(category, case=False, na=False)].to_dict(orient="records")
+
+
+def scan_priority(df, priority):
+    return df[df["Order_Priority"].str.contains(priority, case=False, na=False)].to_dict(orient="records")
+
+
+def scan_profit(df, min_profit):
+    return df[pd.to_numeric(df["Profit"], errors="coerce") > min_profit].to_dict(orient="records")
+
+
+def workload(raw: pd.DataFrame, iterations: int, seed: int = 0):
+    """(endpoint, argument) pairs drawn from the data itself"""
+    rng = random.Random(seed)
+    customers = raw["Customer_Id"].dropna().astype(int).unique().tolist()
+    categories = raw["Product_Category"].dropna().unique().tolist()
+    profits = raw["Profit"].dropna().quantile([0.5, 0.9, 0.99]).tolist()
+    calls = []
+    for _ in range(iterations):
+        calls.append(("customer", rng.choice(customers)))
+        calls.append(("category", rng.choice(categories).split()[0]))
+        calls.append(("priority", rng.choice(PRIORITIES)))
+        calls.append(("profit", rng.choice(profits)))
+    return calls
+
+
+def percentiles(latencies_ms):
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "calls": len(latencies_ms),
+    }
+
+
+def run_in_process(iterations: int):
+    raw = pd.read_csv(DATASET_PATH)
+
+    start = time.perf_counter()
+    store = OrderStore(raw)
+    print(f"OrderStore built in {(time.perf_counter() - start) * 1000:.0f} ms for {store.n_rows} rows")
+    df = raw.fillna(value="")
+
+    implementations = {
+        "scan": {
+            "customer": lambda v: scan_customer(df, v),
+            "category": lambda v: scan_category(df, v),
+            "priority": lambda v: scan_priority(df, v),
+            "profit": lambda v: scan_profit(df, v),
+        },
+        "indexed": {
+            "customer": store.by_customer,
+            "category": store.by_category,
+            "priority": store.by_priority,
+            "profit": store.profit_above,
+        },
+    }
+    calls = workload(raw, iterations)
+    for name, handlers in implementations.items():
+        latencies = {endpoint: [] for endpoint in handlers}
+        for endpoint, argument in calls:
+            t0 = time.perf_counter()
+            handlers[endpoint](argument)
+            latencies[endpoint].append((time.perf_counter() - t0) * 1000)
+        for endpoint, values in latencies.items():
+            print(f"{name:8s} {endpoint:9s} {percentiles(values)}")
+
+
+def run_http(url: str, iterations: int, concurrency: int):
+    import requests
+
+    raw = pd.read_csv(DATASET_PATH)
+    paths = {
+        "customer": "/data/customer/{}",
+        "category": "/data/product-category/{}",
+        "priority": "/data/order-priority/{}",
+        "profit": "/data/high-profit-products?min_profit={}",
+    }
+    session = requests.Session()
+
+    def call(item):
+        endpoint, argument = item
+        t0 = time.perf_counter()
+        session.get(url.rstrip("/") + paths[endpoint].format(argument), timeout=60).raise_for_status()
+        return endpoint, (time.perf_counter() - t0) * 1000
+
+    latencies = {endpoint: [] for endpoint in paths}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for endpoint, elapsed in pool.map(call, workload(raw, iterations)):
+            latencies[endpoint].append(elapsed)
+    total = time.perf_counter() - start
+    for endpoint, values in latencies.items():
+        print(f"http     {endpoint:9s} {percentiles(values)}")
+    print(f"{sum(map(len, latencies.values())) / total:.1f} requests/s at concurrency {concurrency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--url", default=None, help="Load-test a running server instead of comparing in-process")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    if args.url:
+        run_http(args.url, args.iterations, args.concurrency)
+    else:
+        run_in_process(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
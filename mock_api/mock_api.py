@@ -1,73 +1,151 @@
-from fastapi import FastAPI
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 import pandas as pd
+from aggregates import AggregateStore
+from order_store import REQUIRED_COLUMNS, OrderStore
+
+# Shared metrics helpers live with the assistant code
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+from columnar import read_dataset
+from telemetry import instrument_fastapi
 
 # Load dataset
 DATASET_PATH = "../data/Order_Data_Dataset.csv"
-df = pd.read_csv(DATASET_PATH)
+
+# Index the dataset once at startup; lookups no longer scan the whole frame.
+# Read from the typed Arrow copy (src/columnar.py) when it exists, otherwise the CSV
+raw_df = read_dataset(DATASET_PATH)
+store = OrderStore(raw_df)
+# Summary statistics are computed once here and kept current as orders are appended
+aggregates = AggregateStore(raw_df)
+del raw_df
+append_lock = threading.Lock()
 
 # Initialize FastAPI app
 app = FastAPI(title="E-commerce Dataset API", description="API for querying e-commerce sales data")
+# Per-route latency histograms and status counts, served at /metrics
+instrument_fastapi(app, service="mock_api")
+
+MAX_PAGE_SIZE = 5000
 
-# Clean data (e.g., handle NaN values) at the start
-df.fillna(value="", inplace=True)
+
+def paginated(
+    rows,
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    format: str,
+):
+    """
+    Shape a list response. Without limit/cursor/format the full JSON list is
+    returned as before. With limit or cursor a page is returned as
+    {"items", "next_cursor", "total"}; pass next_cursor back to get the next page.
+    format=ndjson streams one JSON record per line from a generator.
+    """
+    columns = None
+    if fields:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in columns if f not in store.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    total = len(rows)
+    end = min(offset + limit, total) if limit else total
+    page = rows[offset:end]
+
+    if format == "ndjson":
+        lines = (json.dumps(record, default=str) + "\n" for record in store.iter_records(page, columns))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    if limit is None and cursor is None:
+        return list(store.iter_records(page, columns))
+    return {
+        "items": list(store.iter_records(page, columns)),
+        "next_cursor": str(end) if end < total else None,
+        "total": total,
+    }
+
+
+# Query parameters shared by the list endpoints
+LIMIT = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables paginated responses")
+CURSOR = Query(None, description="next_cursor from the previous page")
+FIELDS = Query(None, description="Comma-separated columns to return")
+FORMAT = Query("json", pattern="^(json|ndjson)$", description="json, or ndjson to stream records")
 
 # Endpoint to get all data
 @app.get("/data")
-def get_all_data():
+def get_all_data(limit: Optional[int] = LIMIT, cursor: Optional[str] = CURSOR,
+                 fields: Optional[str] = FIELDS, format: str = FORMAT):
     """Retrieve all records in the dataset."""
-    return df.to_dict(orient="records")
+    return paginated(store.all_rows(), limit, cursor, fields, format)
 
 # Endpoint to filter data by Customer ID
 @app.get("/data/customer/{customer_id}")
 def get_customer_data(customer_id: int):
     """Retrieve all records for a specific Customer ID."""
-    filtered_data = df[df["Customer_Id"] == customer_id]
-    if filtered_data.empty:
+    filtered_data = store.by_customer(customer_id)
+    if not filtered_data:
         return {"error": f"No data found for Customer ID {customer_id}"}
-    return filtered_data.to_dict(orient="records")
+    return filtered_data
 
 # Endpoint to filter data by Product Category
 @app.get("/data/product-category/{category}")
-def get_product_category_data(category: str):
+def get_product_category_data(category: str, limit: Optional[int] = LIMIT, cursor: Optional[str] = CURSOR,
+                              fields: Optional[str] = FIELDS, format: str = FORMAT):
     """Retrieve all records for a specific Product Category."""
-    filtered_data = df[df["Product_Category"].str.contains(category, case=False, na=False)]
-    if filtered_data.empty:
+    rows = store.category_rows(category)
+    if not len(rows):
         return {"error": f"No data found for Product Category '{category}'"}
-    return filtered_data.to_dict(orient="records")
+    return paginated(rows, limit, cursor, fields, format)
 
 # Endpoint to get orders with specific priorities
 @app.get("/data/order-priority/{priority}")
-def get_orders_by_priority(priority: str):
+def get_orders_by_priority(priority: str, limit: Optional[int] = LIMIT, cursor: Optional[str] = CURSOR,
+                           fields: Optional[str] = FIELDS, format: str = FORMAT):
     """Retrieve all orders with the given priority."""
-    filtered_data = df[df["Order_Priority"].str.contains(priority, case=False, na=False)]
-    if filtered_data.empty:
+    rows = store.priority_rows(priority)
+    if not len(rows):
         return {"error": f"No data found for Order Priority '{priority}'"}
-    return filtered_data.to_dict(orient="records")
+    return paginated(rows, limit, cursor, fields, format)
 
 # Endpoint to calculate total sales by Product Category
 @app.get("/data/total-sales-by-category")
 def total_sales_by_category():
     """Calculate total sales by Product Category."""
-    sales_summary = df.groupby("Product_Category")["Sales"].sum().reset_index()
-    return sales_summary.to_dict(orient="records")
+    return [
+        {"Product_Category": row["Product_Category"], "Sales": row["sum"]}
+        for row in aggregates.rollup("Sales", ["Product_Category"])
+    ]
 
 # Endpoint to get high-profit products
 @app.get("/data/high-profit-products")
-def high_profit_products(min_profit: float = 100.0):
+def high_profit_products(min_profit: float = 100.0, limit: Optional[int] = LIMIT, cursor: Optional[str] = CURSOR,
+                         fields: Optional[str] = FIELDS, format: str = FORMAT):
     """Retrieve products with profit greater than the specified value."""
-    filtered_data = df[df["Profit"] > min_profit]
-    if filtered_data.empty:
+    rows = store.profit_rows_above(min_profit)
+    if not len(rows):
         return {"error": f"No products found with profit greater than {min_profit}"}
-    return filtered_data.to_dict(orient="records")
+    return paginated(rows, limit, cursor, fields, format)
 
 # Endpoint to get shipping cost summary
 @app.get("/data/shipping-cost-summary")
 def shipping_cost_summary():
     """Retrieve the average, minimum, and maximum shipping cost."""
+    shipping = aggregates.rollup("Shipping_Cost")[0]
     summary = {
-        "average_shipping_cost": df["Shipping_Cost"].mean(),
-        "min_shipping_cost": df["Shipping_Cost"].min(),
-        "max_shipping_cost": df["Shipping_Cost"].max()
+        "average_shipping_cost": shipping["mean"],
+        "min_shipping_cost": shipping["min"],
+        "max_shipping_cost": shipping["max"]
     }
     return summary
 
@@ -75,5 +153,44 @@ def shipping_cost_summary():
 @app.get("/data/profit-by-gender")
 def profit_by_gender():
     """Calculate total profit by customer gender."""
-    profit_summary = df.groupby("Gender")["Profit"].sum().reset_index()
-    return profit_summary.to_dict(orient="records")
\ No newline at end of file
+    return [
+        {"Gender": row["Gender"], "Profit": row["sum"]}
+        for row in aggregates.rollup("Profit", ["Gender"])
+    ]
+
+# Endpoint to aggregate any measure by any dimensions and date range
+@app.get("/data/aggregate")
+def aggregate(
+    measure: str = Query(..., description="Numeric column, e.g. Sales, Profit, Shipping_Cost"),
+    by: Optional[str] = Query(None, description="Comma-separated dimensions, e.g. Product_Category,Order_Priority"),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Inclusive, YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Inclusive, YYYY-MM-DD"),
+):
+    """Sum, count, mean, min and max of a measure, served from precomputed aggregates."""
+    dimensions = [d.strip() for d in by.split(",") if d.strip()] if by else []
+    try:
+        return aggregates.query(measure, dimensions, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Endpoint to append new orders
+@app.post("/data/orders")
+def append_orders(orders: List[Dict[str, Any]]):
+    """Append order records; indexes and aggregates are updated incrementally, both or neither."""
+    new_rows = pd.DataFrame.from_records(orders)
+    unknown = [c for c in new_rows.columns if c not in store.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    missing = [c for c in REQUIRED_COLUMNS if c not in new_rows.columns or new_rows[c].isna().any()]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Every order needs: {', '.join(missing)}")
+    if pd.to_numeric(new_rows["Customer_Id"], errors="coerce").isna().any():
+        raise HTTPException(status_code=400, detail="Customer_Id must be numeric")
+    # Both stores get the same frame, with absent optional fields as missing values
+    new_rows = new_rows.reindex(columns=store.columns)
+    with append_lock:
+        # Staged first: if grouping fails nothing has changed, and applying it cannot fail
+        staged = aggregates.prepare(new_rows)
+        store.append(new_rows)
+        aggregates.apply(staged)
+    return {"appended": len(new_rows), "total_rows": store.n_rows}
\ No newline at end of file
@@ -0,0 +1,191 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Fields every appended order must have; the indexes are keyed on them
+REQUIRED_COLUMNS = ("Customer_Id", "Product_Category", "Order_Priority")
+# Rows turned into dicts at a time when streaming
+RECORD_BATCH = 1000
+# Appended frames are merged (without the loaded table) once there are this many
+MAX_APPENDED_FRAMES = 32
+
+
+class OrderStore:
+    """
+    Order dataset indexed for the API's lookups:
+    - a hash index from Customer_Id to row offsets
+    - categorical codes for Product_Category and Order_Priority, with the rows of each code
+    - Profit sorted once, so "profit greater than" is a binary search
+
+    Columns stay as loaded (zero-copy when read from Arrow); dicts are built only for
+    the rows and fields a response returns.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        positions = np.arange(self.n_rows)
+
+        customer_ids = pd.to_numeric(df["Customer_Id"], errors="coerce")
+        self.customer_index: Dict[int, np.ndarray] = {
+            int(customer_id): rows
+            for customer_id, rows in pd.Series(positions).groupby(customer_ids.values).indices.items()
+        }
+
+        self.category_values, self.category_code_rows = self._encode(df["Product_Category"])
+        self.priority_values, self.priority_code_rows = self._encode(df["Order_Priority"])
+
+        profit = pd.to_numeric(df["Profit"], errors="coerce").to_numpy(dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(profit))
+        order = np.argsort(profit[valid], kind="stable")
+        self.profit_rows = valid[order]
+        self.profit_sorted = profit[self.profit_rows]
+
+        self.columns: List[str] = list(df.columns)
+        # The loaded table followed by the appended batches, and the row offset of each
+        self._frames: List[pd.DataFrame] = [df.reset_index(drop=True)]
+        self._frame_starts = np.array([0], dtype=np.int64)
+
+    def append(self, new_rows: pd.DataFrame):
+        """
+        Add orders to the end of the dataset, updating the indexes in place.
+        Cost grows with the number of new rows (plus one insert into the sorted Profit array).
+        Everything is computed before the store is touched, so a failure leaves it unchanged.
+        """
+        if new_rows.empty:
+            return
+        new_rows = new_rows.reindex(columns=self.columns)
+        positions = np.arange(self.n_rows, self.n_rows + len(new_rows))
+
+        customer_ids = pd.to_numeric(new_rows["Customer_Id"], errors="coerce")
+        customer_updates = {}
+        for customer_id, rows in pd.Series(positions).groupby(customer_ids.values).indices.items():
+            key = int(customer_id)
+            existing = self.customer_index.get(key)
+            new = positions[rows]
+            customer_updates[key] = new if existing is None else np.concatenate([existing, new])
+
+        category_values, category_code_rows = self._extend_codes(
+            self.category_values, self.category_code_rows, new_rows["Product_Category"], positions)
+        priority_values, priority_code_rows = self._extend_codes(
+            self.priority_values, self.priority_code_rows, new_rows["Order_Priority"], positions)
+
+        profit = pd.to_numeric(new_rows["Profit"], errors="coerce").to_numpy(dtype=np.float64)
+        valid = ~np.isnan(profit)
+        order = np.argsort(profit[valid], kind="stable")
+        new_profit, new_positions = profit[valid][order], positions[valid][order]
+        at = np.searchsorted(self.profit_sorted, new_profit, side="right")
+        profit_sorted = np.insert(self.profit_sorted, at, new_profit)
+        profit_rows = np.insert(self.profit_rows, at, new_positions)
+
+        self.customer_index.update(customer_updates)
+        self.category_values, self.category_code_rows = category_values, category_code_rows
+        self.priority_values, self.priority_code_rows = priority_values, priority_code_rows
+        self.profit_sorted, self.profit_rows = profit_sorted, profit_rows
+        self._frames.append(new_rows.reset_index(drop=True))
+        self._frame_starts = np.append(self._frame_starts, self.n_rows)
+        self.n_rows += len(new_rows)
+        if len(self._frames) > MAX_APPENDED_FRAMES + 1:
+            # Only the appended rows are copied; the loaded table is never concatenated onto
+            self._frames = [self._frames[0], pd.concat(self._frames[1:], ignore_index=True)]
+            self._frame_starts = self._frame_starts[:2]
+
+    @staticmethod
+    def _extend_codes(values: np.ndarray, code_rows: List[np.ndarray], column: pd.Series, positions: np.ndarray):
+        """Per-value row lists with the rows appended, adding codes for unseen values; the inputs are not modified"""
+        code_of = {value: code for code, value in enumerate(values)}
+        code_rows = list(code_rows)
+        added = []
+        for value, rows in pd.Series(positions).groupby(column.values).indices.items():
+            code = code_of.get(value)
+            if code is None:
+                code = len(values) + len(added)
+                added.append(value)
+                code_rows.append(positions[rows])
+            else:
+                code_rows[code] = np.concatenate([code_rows[code], positions[rows]])
+        if added:
+            values = np.concatenate([values, np.array(added, dtype=object)])
+        return values, code_rows
+
+    @staticmethod
+    def _clean(df: pd.DataFrame) -> pd.DataFrame:
+        """Missing values as empty strings; works for categorical columns, unlike fillna("")"""
+        return df.astype(object).where(df.notna(), "")
+
+    @staticmethod
+    def _encode(column: pd.Series):
+        """Distinct values of a column and the row offsets holding each one"""
+        categorical = column.astype("category")
+        codes = categorical.cat.codes.to_numpy()
+        rows_by_code = pd.Series(np.arange(len(codes))).groupby(codes).indices
+        values = categorical.cat.categories.to_numpy(dtype=object)
+        return values, [rows_by_code.get(code, np.empty(0, dtype=np.int64)) for code in range(len(values))]
+
+    @staticmethod
+    def _matching_rows(values: np.ndarray, rows: List[np.ndarray], pattern: str) -> np.ndarray:
+        """
+        Rows whose value contains pattern (case-insensitive regex, like Series.str.contains).
+        The pattern is evaluated once per distinct value rather than once per row.
+        """
+        matches = pd.Series(values, dtype=object).str.contains(pattern, case=False, na=False).to_numpy()
+        selected = [rows[code] for code in np.flatnonzero(matches)]
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
+
+    def _records(self, rows: np.ndarray, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Cleaned dicts for rows, in the given order, optionally projected to fields"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        which = np.searchsorted(self._frame_starts, rows, side="right") - 1
+        if (which == which[0]).all():
+            part = self._frames[which[0]].iloc[rows - self._frame_starts[which[0]]]
+        else:
+            # Rows from several frames: take each frame's rows, then restore the requested order
+            order = np.argsort(which, kind="stable")
+            part = pd.concat([
+                self._frames[w].iloc[rows[which == w] - self._frame_starts[w]] for w in np.unique(which)
+            ]).iloc[np.argsort(order)]
+        if fields is not None:
+            part = part[fields]
+        return self._clean(part).to_dict(orient="records")
+
+    def select(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        return self._records(rows)
+
+    def all_rows(self) -> np.ndarray:
+        return np.arange(self.n_rows)
+
+    def customer_rows(self, customer_id: int) -> np.ndarray:
+        return self.customer_index.get(customer_id, np.empty(0, dtype=np.int64))
+
+    def category_rows(self, category: str) -> np.ndarray:
+        return self._matching_rows(self.category_values, self.category_code_rows, category)
+
+    def priority_rows(self, priority: str) -> np.ndarray:
+        return self._matching_rows(self.priority_values, self.priority_code_rows, priority)
+
+    def profit_rows_above(self, min_profit: float) -> np.ndarray:
+        start = np.searchsorted(self.profit_sorted, min_profit, side="right")
+        # Back to dataset order, as the scan returned them
+        return np.sort(self.profit_rows[start:])
+
+    def by_customer(self, customer_id: int) -> List[Dict[str, Any]]:
+        return self.select(self.customer_rows(customer_id))
+
+    def by_category(self, category: str) -> List[Dict[str, Any]]:
+        return self.select(self.category_rows(category))
+
+    def by_priority(self, priority: str) -> List[Dict[str, Any]]:
+        return self.select(self.priority_rows(priority))
+
+    def profit_above(self, min_profit: float) -> List[Dict[str, Any]]:
+        return self.select(self.profit_rows_above(min_profit))
+
+    def iter_records(self, rows: np.ndarray, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Records for rows, optionally projected to fields, built RECORD_BATCH rows at a time"""
+        for start in range(0, len(rows), RECORD_BATCH):
+            yield from self._records(rows[start:start + RECORD_BATCH], fields)
@@ -1,74 +1,285 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import Future
 import requests
-from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import Awaitable, Callable, Dict, Any, Iterator, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
+from telemetry import count, span
 
 load_dotenv()
 
+# Statuses worth retrying: the mock API is restarting or overloaded
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+def _backoff_delay(attempt: int, base: float, cap: float = 5.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _orders_result(status_code: int, data: Any) -> Dict[str, Any]:
+    """Turn an API response into the {"orders", "error"} shape the tools expect"""
+    if status_code == 200:
+        if isinstance(data, dict) and "error" in data:
+            return {"orders": [], "error": data["error"]}
+        return {"orders": data, "error": None}
+    return {
+        "orders": [],
+        "error": f"API request failed with status code: {status_code}"
+    }
+
+
+def _request_key(url: str, params: Optional[Dict[str, Any]]) -> Tuple:
+    return (url, tuple(sorted((params or {}).items())))
+
+
 class OrderAPI:
-    def __init__(self, api_url: Optional[str] = None):
-        """Initialize the OrderAPI with the base URL from environment variables."""
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+        pool_size: int = 20,
+        session: Optional[requests.Session] = None,
+    ):
+        """
+        Initialize the OrderAPI with the base URL from environment variables.
+
+        Requests share a pooled session, time out after `timeout` seconds and are
+        retried up to `max_retries` times with jittered backoff on connection
+        errors and 429/5xx responses. Identical requests issued concurrently are
+        coalesced into a single upstream call.
+        """
         self.api_url = api_url or os.getenv('MOCK_API_URL') or "http://127.0.0.1:8000/data/"
         if not self.api_url:
             raise ValueError("API URL not found. Please set MOCK_API_URL in .env file")
-    
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._inflight: Dict[Tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def _request(self, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """GET with timeout and bounded, jittered retries"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                count("order_api_responses_total", status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                count("order_api_errors_total", error=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+            time.sleep(_backoff_delay(attempt, self.backoff))
+
+    def _coalesced(self, key: Tuple, fetch: Callable[[], Any]) -> Any:
+        """Run fetch once for all callers currently asking for the same key"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            self.coalesced_calls += 1
+            return future.result()
+        try:
+            self.upstream_calls += 1
+            result = fetch()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _get_orders(self, url: str, endpoint: str) -> Dict[str, Any]:
+        def fetch():
+            response = self._request(url)
+            with span("order_api.parse", endpoint=endpoint):
+                data = response.json() if response.status_code == 200 else None
+            return _orders_result(response.status_code, data)
+
+        try:
+            with span("order_api.get", endpoint=endpoint):
+                return self._coalesced(_request_key(url, None), fetch)
+        except requests.RequestException as e:
+            return {"orders": [], "error": f"Request failed: {str(e)}"}
+        except Exception as e:
+            return {"orders": [], "error": f"Unexpected error: {str(e)}"}
+
     def get_order_by_id(self, customer_id: int) -> Dict[str, Any]:
         """
         Get orders for a specific customer ID from the mock API.
-        
+
         Args:
             customer_id (int): The ID of the customer to query
-            
+
         Returns:
             Dict[str, Any]: A dictionary containing either:
                 - {"orders": [...], "error": None} if successful
                 - {"orders": [], "error": "error message"} if there's an error
         """
-        try:
-            url = f"{self.api_url}customer/{customer_id}"
-            response = requests.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, dict) and "error" in data:
-                    return {"orders": [], "error": data["error"]}
-                return {"orders": data, "error": None}
-            
-            return {
-                "orders": [], 
-                "error": f"API request failed with status code: {response.status_code}"
-            }
-            
-        except requests.RequestException as e:
-            return {"orders": [], "error": f"Request failed: {str(e)}"}
-        except Exception as e:
-            return {"orders": [], "error": f"Unexpected error: {str(e)}"}
-        
+        return self._get_orders(f"{self.api_url}customer/{customer_id}", "customer")
+
     def get_order_by_priority(self, priority: str) -> Dict[str, Any]:
         """
         Get orders by priority from the mock API.
-        
+
         Args:
             priority: The priority level to filter by
-            
+
+        """
+        return self._get_orders(f"{self.api_url}order-priority/{priority}", "order-priority")
+
+    def iter_orders_by_priority(
+        self,
+        priority: str,
+        page_size: int = 500,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily iterate over orders with the given priority, one page at a time.
+
+        Args:
+            priority: The priority level to filter by
+            page_size: Records requested per page
+            fields: Columns to return (all if None)
+
+        Raises:
+            requests.RequestException: If a page cannot be fetched
+        """
+        yield from self._iter_pages(f"{self.api_url}order-priority/{priority}", page_size, fields)
+
+    def iter_orders(self, page_size: int = 500, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily iterate over every order in the dataset, one page at a time."""
+        yield from self._iter_pages(self.api_url.rstrip("/"), page_size, fields)
+
+    def _iter_pages(self, url: str, page_size: int, fields: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+        params = {"limit": page_size}
+        if fields:
+            params["fields"] = ",".join(fields)
+        while True:
+            response = self._request(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            # Empty results come back as {"error": ...} rather than an empty page
+            if "items" not in data:
+                return
+            yield from data["items"]
+            if not data["next_cursor"]:
+                return
+            params["cursor"] = data["next_cursor"]
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOrderAPI:
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+        pool_size: int = 20,
+        transport=None,
+    ):
+        """
+        asyncio variant of OrderAPI on a pooled httpx.AsyncClient, with the same
+        timeouts, retries, request coalescing and return shapes.
+
+        Pass transport=httpx.ASGITransport(app=mock_api.app) to run against the
+        mock API in-process, without a server.
         """
+        import httpx
+
+        self.api_url = api_url or os.getenv('MOCK_API_URL') or "http://127.0.0.1:8000/data/"
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    async def _request(self, url: str, params: Optional[Dict[str, Any]] = None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.get(url, params=params)
+                count("order_api_responses_total", status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+            except (self._httpx.TransportError, self._httpx.TimeoutException) as e:
+                count("order_api_errors_total", error=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(_backoff_delay(attempt, self.backoff))
+
+    async def _coalesced(self, key: Tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced_calls += 1
+            # shield: one caller being cancelled must not cancel the shared request
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(fetch())
+        self._inflight[key] = future
+        self.upstream_calls += 1
         try:
-            url = f"{self.api_url}order-priority/{priority}"
-            response = requests.get(url)
-            
-            if response.status_code == 200:
-                print(response.json())
-                data = response.json()
-                if isinstance(data, dict) and "error" in data:
-                    return {"orders": [], "error": data["error"]}
-                return {"orders": data, "error": None}
-            
-            return {
-                "orders": [], 
-                "error": f"API request failed with status code: {response.status_code}"
-            }
-            
-        except requests.RequestException as e:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _get_orders(self, url: str, endpoint: str) -> Dict[str, Any]:
+        async def fetch():
+            response = await self._request(url)
+            data = response.json() if response.status_code == 200 else None
+            return _orders_result(response.status_code, data)
+
+        try:
+            with span("order_api.get", endpoint=endpoint):
+                return await self._coalesced(_request_key(url, None), fetch)
+        except self._httpx.HTTPError as e:
             return {"orders": [], "error": f"Request failed: {str(e)}"}
         except Exception as e:
-            return {"orders": [], "error": f"Unexpected error: {str(e)}"}
\ No newline at end of file
+            return {"orders": [], "error": f"Unexpected error: {str(e)}"}
+
+    async def get_order_by_id(self, customer_id: int) -> Dict[str, Any]:
+        """Get orders for a specific customer ID from the mock API."""
+        return await self._get_orders(f"{self.api_url}customer/{customer_id}", "customer")
+
+    async def get_order_by_priority(self, priority: str) -> Dict[str, Any]:
+        """Get orders by priority from the mock API."""
+        return await self._get_orders(f"{self.api_url}order-priority/{priority}", "order-priority")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -1,15 +1,25 @@
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 from dotenv import load_dotenv
-# from langchain_mistralai import ChatMistralAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage, ToolMessage
-from langchain.agents import initialize_agent, AgentType
-from langchain.tools import tool
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.tools import tool
 from api_client import OrderAPI
 import logging
-import pandas as pd
-from rag import ProductRAG
+# pandas, FAISS, sentence-transformers, langchain agents and the Gemini client are
+# imported where they are first needed, so importing this module stays cheap
+from query_cache import QueryCache, numbers_in
+from chatbot.result_shaping import ToolOutputShaper
+from chatbot.memory import ConversationMemory
+from chatbot.router import IntentRouter, Route
+from chatbot.streaming import AgentStreamHandler
+from chatbot.instrumentation import TelemetryCallbackHandler
+from telemetry import observe, register_gauge, span
+from collections import Counter
+from concurrent.futures import Executor
+import asyncio
+import queue
+import threading
+import time
 from pathlib import Path
 
 # Configure logging
@@ -19,58 +29,201 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-class EcommerceAssistant:
-    def __init__(
-        self,
-    ):
-        # Load products data
-        csv_path = Path(__file__).parent.parent.parent / 'data' / 'Product_Information_Dataset.csv'
-        print(csv_path)
-        logger.info(f"Intentando cargar el archivo CSV desde: {csv_path}")
-        df_products = pd.read_csv(csv_path)
-        rag = ProductRAG()
-        rag.create_vectorstore(df_products)
-
-        def search_index(query, k=5):
-            results = rag.search(query, k=k)
-            # Use the document index instead of metadata
-            indices = [i for i in range(len(results))]
-            scores = [doc.metadata.get('score', 0.0) for doc in results]
-            return indices, scores
-
-        # Initialize message history
-        self.messages: List[BaseMessage] = []
-        
+# Catalog columns the index, hybrid search and product table read; the rest are never loaded
+PRODUCT_COLUMNS = ['parent_asin', 'main_category', 'title', 'average_rating', 'description', 'price']
+
+DIRECT_ANSWER_PROMPT = """{system_prompt}
+
+Conversation so far:
+{conversation}
+
+The {tool} tool returned:
+{tool_output}
+
+Answer the user's last message using this result."""
+
+class AssistantEngine:
+    """
+    Process-wide, read-only part of the assistant: product data, embedding model,
+    FAISS index, search caches, the order API connection pool, the LLM client and
+    the intent router. Built once and shared by every EcommerceAssistant session.
+
+    With background=True the constructor returns as soon as the order API and LLM
+    clients exist and the product side (CSV, model, index, searcher) warms up in a
+    thread. Until is_ready, order questions are answered normally, the router uses
+    keyword rules only and product search reports that it is still loading.
+    """
+
+    def __init__(self, llm=None, background: bool = False):
+        self._created = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.ready = threading.Event()
+        self.warmup_error: Optional[BaseException] = None
+        self.rag = self.products = self.searcher = None
+        self.search_cache: Optional[QueryCache] = None
+        self.answer_cache: Optional[QueryCache] = None
+        # Keyword rules only until the embedding model is loaded
+        self.router = IntentRouter()
+
         # Initialize OrderAPI
         self.order_api = OrderAPI()
-        
+
         # Initialize Mistral model
+        # from langchain_mistralai import ChatMistralAI
         # self.llm = ChatMistralAI(
         #     model="mistral-large-latest",
         #     mistral_api_key=os.getenv("MISTRAL_API_KEY"),
         #     temperature=0.0
         # )
 
-                # Initialize Gemini model
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            temperature=0.0
-        )
-        
+        # Initialize Gemini model, unless a chat model is injected (e.g. a fake one for benchmarks)
+        if llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            llm = ChatGoogleGenerativeAI(
+                model="gemini-2.0-flash",
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+                temperature=0.0
+            )
+        self.llm = llm
+
+        # Tool and LLM timings and token counts, shared by every session
+        self.callbacks = [TelemetryCallbackHandler()]
+        self.timings["init_ms"] = (time.perf_counter() - self._created) * 1000
+
+        if background:
+            threading.Thread(target=self._warm_up_in_background, daemon=True, name="engine-warm-up").start()
+        else:
+            self.warm_up()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self.ready.wait(timeout)
+
+    def _warm_up_in_background(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            self.warmup_error = e
+            logger.exception("Product search warm-up failed; only order queries will work")
+
+    def warm_up(self):
+        """Load the catalog, model and index, and run a first encode so no user turn pays for it"""
+        start = time.perf_counter()
+        with span("engine.warm_up"):
+            from columnar import read_dataset
+            from hybrid_search import HybridSearcher
+            from product_table import ProductTable
+            from rag import ProductRAG
+            self.timings["warm_up_imports_ms"] = (time.perf_counter() - start) * 1000
+
+            # Load products data
+            csv_path = Path(__file__).parent.parent.parent / 'data' / 'Product_Information_Dataset.csv'
+            logger.info(f"Intentando cargar el archivo CSV desde: {csv_path}")
+            # Memory-mapped from the Arrow copy when one has been built (src/columnar.py)
+            df_products = read_dataset(csv_path, columns=PRODUCT_COLUMNS)
+            # The FAISS index is cached next to the data and rebuilt only when the catalog changes
+            cache_dir = os.getenv("RAG_CACHE_DIR") or csv_path.parent / 'faiss_cache'
+            # A cold build embeds in length-bucketed batches, on RAG_EMBED_WORKERS processes
+            rag = ProductRAG(cache_dir=cache_dir, embed_workers=int(os.getenv("RAG_EMBED_WORKERS", "1")))
+            rag.create_vectorstore(df_products)
+            rag.load_filter_ranges(csv_path)
+            products = ProductTable(df_products, id_column=rag.id_column)
+            searcher = HybridSearcher.from_dataframe(rag, df_products, table=products)
+            # The first encode initialises the tokenizer and model weights
+            rag.embed_query("warm up")
+
+            # Search results and first-turn product-search answers are reused for repeated or
+            # near-duplicate questions, and dropped whenever the product index changes
+            search_cache = QueryCache(embed_fn=rag.embed_query, version_fn=lambda: rag.index_version)
+            answer_cache = QueryCache(
+                embed_fn=rag.embed_query,
+                ttl_seconds=600,
+                max_size=512,
+                version_fn=lambda: rag.index_version,
+            )
+            # Simple lookups skip the ReAct loop: one tool call and at most one LLM call
+            router = IntentRouter(embed_fn=rag.embed_query)
+
+        # Publish everything together so sessions never see a half-built product side
+        self.rag, self.products, self.searcher = rag, products, searcher
+        self.search_cache, self.answer_cache = search_cache, answer_cache
+        self.router = router
+        for name, cache in (("search", search_cache), ("answer", answer_cache)):
+            register_gauge("query_cache_hit_ratio", lambda cache=cache: cache.stats()["hit_rate"], cache=name)
+            register_gauge("query_cache_entries", lambda cache=cache: cache.stats()["size"], cache=name)
+
+        self.timings["warm_up_ms"] = (time.perf_counter() - start) * 1000
+        self.timings["ready_ms"] = (time.perf_counter() - self._created) * 1000
+        self.ready.set()
+        logger.info(f"Assistant engine ready in {self.timings['ready_ms']:.0f} ms")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready,
+            "error": str(self.warmup_error) if self.warmup_error else None,
+            "timings_ms": {k: round(v, 1) for k, v in self.timings.items()},
+        }
+
+
+class EcommerceAssistant:
+    def __init__(
+        self,
+        engine: Optional[AssistantEngine] = None,
+        llm=None,
+    ):
+        """
+        One conversation. Only the conversation state (memory, tool output
+        handles, the agent wrapper) is per session; everything heavy comes from
+        engine, which is created here if not given.
+        """
+        from langchain.agents import initialize_agent, AgentType
+
+        self.engine = engine = engine or AssistantEngine(llm=llm)
+        self.order_api = engine.order_api
+        self.llm = engine.llm
+
+        # Large order sets are summarised and every tool output is kept within a token budget
+        self.shaper = ToolOutputShaper(budgets={"get_orders_by_priority": 1200})
+
         # Initialize tools
         self.tools = []
         @tool
         def search_products(query: str) -> str:
             """Search for products in the database.
             Input should be a search query about products.
+            Price, rating and category constraints in the query (e.g. "under $200", "4+ stars",
+            "best-rated") are applied as filters.
             Returns a list of relevant products with their titles, prices, and ratings.
             Use this when the user asks about specific products or wants recommendations."""
+            if not engine.is_ready:
+                return "Product search is still starting up. Please try again in a few seconds."
+            from hybrid_search import parse_filters
+
+            products, searcher = engine.products, engine.searcher
             try:
-                indices, scores = search_index(query, k=5)
-                productos = df_products.iloc[indices][['main_category', 'title', 'price', 'average_rating']]
-                productos['relevancia'] = scores
-                tool_response = f"Products found:\n{productos.to_string()}"
+                filters = parse_filters(query, products.categories, engine.rag.filter_ranges)
+                namespace = (filters.describe(), numbers_in(query))
+                cached = self.search_cache.get(query, namespace)
+                if cached is not None:
+                    return cached
+                results = searcher.search(query, k=5, filters=filters)
+                applied = f" (filters: {filters.describe()})" if not filters.is_empty() else ""
+                if not results:
+                    tool_response = f"No products found{applied}"
+                else:
+                    with span("search.format"):
+                        formatted = products.format_results(results, score_label='relevance')
+                    tool_response = f"Products found{applied}:\n{formatted}"
+                    for product_id, _ in results[:3]:
+                        row = products.row_of.get(product_id)
+                        if row is not None:
+                            self.memory.remember("products", str(products.title[row])[:80])
+                tool_response = self.shaper.shape_text("search_products", tool_response)
+                self.search_cache.put(query, tool_response, namespace)
                 return tool_response
             except Exception as e:
                 error_msg = f"Error searching products: {str(e)}"
@@ -92,7 +245,8 @@ class EcommerceAssistant:
                 if not result["orders"]:
                     tool_response = f"No orders found for customer ID: {customer_id}"
                     return tool_response
-                tool_response = f"Order details:\n{result['orders']}"
+                tool_response = self.shaper.shape_orders(
+                    "get_order", f"Order details for customer {customer_id}", result["orders"])
                 return tool_response
             except ValueError:
                 tool_response = "Please provide a valid customer ID number"
@@ -125,15 +279,24 @@ class EcommerceAssistant:
                     tool_response = f"No orders found with priority level: {priority}"
                     return tool_response
                 
-                # Formatear la respuesta para mejor legibilidad
-                orders = result["orders"]
-                tool_response = f"Orders with {priority} priority:\n\n" + f"\n\n {orders}"
+                # Summary, totals and the most recent orders instead of the full list
+                tool_response = self.shaper.shape_orders(
+                    "get_orders_by_priority", f"Orders with {priority} priority", result["orders"])
                 return tool_response
             except Exception as e:
                 tool_response = f"Error processing priority request: {str(e)}"
                 return tool_response
         
         self.tools.append(get_orders_by_priority)
+
+        @tool
+        def get_more_results(handle: str) -> str:
+            """Get the next page of a tool result that was cut short.
+            Input should be the handle given in a "More available" line.
+            Use this only when the user needs orders beyond the ones already shown."""
+            return self.shaper.more(handle.strip().strip("'\""))
+
+        self.tools.append(get_more_results)
         
         # System prompt for the agent
         self.system_prompt = """You are an expert e-commerce customer service assistant.
@@ -162,10 +325,15 @@ class EcommerceAssistant:
         - Suggest relevant alternatives when appropriate
         - Keep the conversation focused on e-commerce topics
         - When showing order information, present it in a clear and organized way
+        - Large order results are summarised; call get_more_results with the given handle only if the user asks for more orders
         - If the user's query is unclear, ask for more details
         - For priority-based queries, ensure to use the correct priority levels: high, medium, low, critical"""
         
-        self.messages.append(SystemMessage(content=self.system_prompt))
+        # Recent turns within a token budget, older ones folded into a running summary
+        self.memory = ConversationMemory(self.system_prompt, llm=self.llm)
+        self.tool_map = {t.name: t for t in self.tools}
+        self.route_counts = Counter()
+        self.latencies: List[Dict[str, Optional[float]]] = []
         # Initialize the agent
         self.agent = initialize_agent(
             tools=self.tools,
@@ -178,27 +346,196 @@ class EcommerceAssistant:
         )
     
     def process_query(self, query: str) -> str:
+        output = ""
+        for event in self.stream_query(query):
+            if event["type"] == "done":
+                output = event["output"]
+        return output
+
+    async def aprocess_query(self, query: str, executor: Optional[Executor] = None) -> str:
+        """
+        process_query on a worker thread, so the event loop stays free while the
+        embedding, FAISS search, order API and LLM calls block. Calls for the
+        same assistant must not overlap; the caller serialises them.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.process_query, query)
+
+    def stream_query(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a query as a stream of events:
+        {"type": "tool_start", "tool", "input"} / {"type": "tool_end", "tool"} while tools run,
+        {"type": "token", "text"} for each piece of the answer, and a final
+        {"type": "done", "output", "ttft_ms", "total_ms"}.
+        """
+        start = time.perf_counter()
+        ttft_ms = None
+        parts = []
+
+        def token(text: str) -> Dict[str, Any]:
+            nonlocal ttft_ms
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - start) * 1000
+            parts.append(text)
+            return {"type": "token", "text": text}
+
+        with span("router.route"):
+            route = self.router.route(query)
+        # Only answers to an opening product search are cached: later turns depend on the
+        # conversation, and order data changes independently of the product index
+        namespace = self._answer_namespace(query, route) if self.memory.is_empty() else None
+        answer_cache = self.answer_cache if namespace is not None else None
+        cached = answer_cache.get(query, namespace) if answer_cache is not None else None
+        # Add user message to history
+        self.memory.add_user(query)
         try:
-            # Add user message to history
-            self.messages.append(HumanMessage(content=query))
-            
-            # Use the agent to process the query and get only the final answer
-            #result = self.agent.invoke({"input": self.messages})
-            result = self.agent.invoke({"input": self.messages})
-            #print(result['intermediate_steps'])
-            # Add assistant response to history
-            self.messages.append(AIMessage(content=result["output"]))
-            
-            return result["output"]
-                
+            answered_directly = False
+            if cached is not None:
+                yield token(cached)
+            else:
+                for event in self._stream_answer(query, route):
+                    if event["type"] == "answered_directly":
+                        answered_directly = True
+                    else:
+                        yield token(event["text"]) if event["type"] == "token" else event
+            output = "".join(parts)
+            # An agent fallback may have looked up orders, so only direct search answers are stored
+            if answered_directly and answer_cache is not None:
+                answer_cache.put(query, output, namespace)
         except Exception as e:
-            error_msg = f"sorry, there was an error processing your query: {str(e)}"
-            self.messages.append(AIMessage(content=error_msg))
-            return error_msg
-        
+            output = f"sorry, there was an error processing your query: {str(e)}"
+            if not parts:
+                yield token(output)
+        # Add assistant response to history
+        self.memory.add_ai(output)
+
+        total_ms = (time.perf_counter() - start) * 1000
+        self.latencies.append({"ttft_ms": ttft_ms, "total_ms": total_ms})
+        observe("chat_turn_seconds", total_ms / 1000)
+        if ttft_ms is not None:
+            observe("chat_ttft_seconds", ttft_ms / 1000)
+        yield {"type": "done", "output": output, "ttft_ms": ttft_ms, "total_ms": total_ms}
+
+    def _answer_namespace(self, query: str, route: Route) -> Optional[tuple]:
+        """
+        Answer cache namespace for a direct product search: the parsed filters and the
+        numbers in the query, so near-identical wording with other constraints never matches
+        """
+        if route.tool != "search_products" or self.answer_cache is None or not self.engine.is_ready:
+            return None
+        from hybrid_search import parse_filters
+
+        filters = parse_filters(query, self.engine.products.categories, self.engine.rag.filter_ranges)
+        return (route.tool, filters.describe(), numbers_in(query))
+
+    def _stream_answer(self, query: str, route: Route) -> Iterator[Dict[str, Any]]:
+        """
+        Token and tool events from the direct route if it applies, from the agent otherwise.
+        An {"type": "answered_directly"} event marks answers that came from the routed tool.
+        """
+        if route.is_direct:
+            streamed = False
+            try:
+                yield {"type": "tool_start", "tool": route.tool, "input": route.tool_input}
+                tool_output = self.tool_map[route.tool].invoke(route.tool_input, config={"callbacks": self.engine.callbacks})
+                yield {"type": "tool_end", "tool": route.tool}
+                prompt = DIRECT_ANSWER_PROMPT.format(
+                    system_prompt=self.system_prompt,
+                    conversation=get_buffer_string(self.memory.prompt()[1:]),
+                    tool=route.tool,
+                    tool_output=tool_output,
+                )
+                for chunk in self.llm.stream(prompt, config={"callbacks": self.engine.callbacks}):
+                    if chunk.content:
+                        streamed = True
+                        yield {"type": "token", "text": str(chunk.content)}
+                logger.info(f"Routed to {route.tool} by {route.source} (confidence {route.confidence:.2f})")
+                self.route_counts[route.source] += 1
+                yield {"type": "answered_directly"}
+                return
+            except Exception as e:
+                if streamed:
+                    raise
+                logger.warning(f"Direct {route.tool} call failed, falling back to the agent: {e}")
+
+        self.route_counts["agent"] += 1
+        yield from self._stream_agent()
+
+    def _stream_agent(self) -> Iterator[Dict[str, Any]]:
+        """Run the agent in a worker thread and relay its callback events as they arrive"""
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        handler = AgentStreamHandler(events)
+        messages = self.memory.prompt()
+
+        def run():
+            try:
+                result = self.agent.invoke({"input": messages}, config={"callbacks": [handler, *self.engine.callbacks]})
+                events.put({"type": "result", "output": result["output"]})
+            except Exception as e:
+                events.put({"type": "error", "error": e})
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            event = events.get()
+            if event["type"] == "error":
+                raise event["error"]
+            if event["type"] == "result":
+                # Models that do not stream, or answers the extractor could not follow,
+                # arrive in one piece
+                if not handler.streamed:
+                    yield {"type": "token", "text": str(event["output"])}
+                return
+            yield event
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """Time to first token and total time per answer, in milliseconds"""
+        ttft = sorted(l["ttft_ms"] for l in self.latencies if l["ttft_ms"] is not None)
+        total = sorted(l["total_ms"] for l in self.latencies)
+        if not total:
+            return {"answers": 0}
+        return {
+            "answers": len(total),
+            "ttft_p50_ms": round(ttft[len(ttft) // 2], 1) if ttft else None,
+            "ttft_p95_ms": round(ttft[min(len(ttft) - 1, int(len(ttft) * 0.95))], 1) if ttft else None,
+            "total_p50_ms": round(total[len(total) // 2], 1),
+            "last_ttft_ms": self.latencies[-1]["ttft_ms"],
+        }
+
+    def route_stats(self) -> Dict[str, int]:
+        """How many queries each path (rule, classifier, agent) answered"""
+        return dict(self.route_counts)
+
+    # Read from the engine on every use: they are replaced when its warm-up finishes
+    @property
+    def router(self) -> IntentRouter:
+        return self.engine.router
+
+    @property
+    def search_cache(self) -> Optional[QueryCache]:
+        return self.engine.search_cache
+
+    @property
+    def answer_cache(self) -> Optional[QueryCache]:
+        return self.engine.answer_cache
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        caches = {"search": self.search_cache, "answer": self.answer_cache}
+        return {name: cache.stats() if cache is not None else {} for name, cache in caches.items()}
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """The bounded history sent to the agent"""
+        return self.memory.messages()
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Per-turn prompt token counts and summarisation state"""
+        return self.memory.stats()
+
+    def token_savings(self) -> Dict[str, Any]:
+        return self.shaper.savings()
+
     def reset_messages(self):
-        self.messages = []
-        self.messages.append(SystemMessage(content=self.system_prompt))
+        self.memory.clear()
 
 def chatbot_response(
     query: str,
@@ -209,6 +546,15 @@ def chatbot_response(
     """
     return assistant.process_query(query)
 
+def chatbot_stream(
+    query: str,
+    assistant: EcommerceAssistant,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of chatbot_response, yielding token, tool and done events
+    """
+    return assistant.stream_query(query)
+
 def clear_conversation(assistant: EcommerceAssistant):
     assistant.reset_messages()
     
\ No newline at end of file
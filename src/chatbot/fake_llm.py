@@ -0,0 +1,112 @@
+import json
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ID_PATTERN = re.compile(r"\b(\d{4,7})\b")
+PRIORITY_PATTERN = re.compile(r"\b(critical|high|medium|low)\b", re.IGNORECASE)
+# The structured chat agent appends its earlier steps after this line once a tool has run
+SCRATCHPAD_MARKER = "This was your previous work"
+OBSERVATION_PATTERN = re.compile(r"Observation:\s*(.*?)(?:\nThought:|$)", re.DOTALL)
+# Last user message, as it appears in the agent's input (a list of messages) or a plain transcript
+QUESTION_PATTERNS = [
+    re.compile(r"HumanMessage\(content=(['\"])(.*?)\1", re.DOTALL),
+    re.compile(r"^Human: (.*)$", re.MULTILINE),
+]
+
+
+def _last_question(text: str) -> str:
+    for pattern in QUESTION_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            last = matches[-1]
+            return last[-1] if isinstance(last, tuple) else last
+    return text[-500:]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, offline stand-in for ChatGoogleGenerativeAI.
+
+    It plays the structured chat ReAct protocol well enough to drive the real
+    agent: the first call picks a tool from keywords in the user's question
+    (a customer ID -> get_order, a priority level -> get_orders_by_priority,
+    anything else -> search_products) and the call after an observation returns
+    a Final Answer quoting it. Any other prompt (direct-route phrasing,
+    conversation summaries) gets a short plain-text reply.
+
+    latency_ms is added before the first token and token_delay_ms between the
+    streamed tokens, to model a remote API.
+    """
+
+    latency_ms: float = 300.0
+    token_delay_ms: float = 5.0
+    answer_chars: int = 400
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        text = "\n".join(str(m.content) for m in messages)
+        if "Final Answer" in text and "Action:" in text:
+            if SCRATCHPAD_MARKER in text:
+                observations = OBSERVATION_PATTERN.findall(text.split(SCRATCHPAD_MARKER, 1)[1])
+                if observations:
+                    return self._final_answer(observations[-1])
+            return self._tool_call(_last_question(text))
+        if "tool returned:" in text:
+            result = text.split("tool returned:", 1)[1].split("Answer the user's last message", 1)[0]
+            return f"Here is what I found: {result.strip()[:self.answer_chars]}"
+        return f"Summary: {_last_question(text)[:self.answer_chars]}"
+
+    @staticmethod
+    def _tool_call(question: str) -> str:
+        customer_id = ID_PATTERN.search(question)
+        priority = PRIORITY_PATTERN.search(question)
+        if customer_id:
+            action = {"action": "get_order", "action_input": {"customer_id": customer_id.group(1)}}
+        elif priority:
+            action = {"action": "get_orders_by_priority", "action_input": {"priority": priority.group(1).lower()}}
+        else:
+            action = {"action": "search_products", "action_input": {"query": question}}
+        return f"Thought: I should use a tool.\nAction:\n```\n{json.dumps(action)}\n```"
+
+    def _final_answer(self, observation: str) -> str:
+        answer = f"Here is what I found: {observation.strip()[:self.answer_chars]}"
+        blob = json.dumps({"action": "Final Answer", "action_input": answer}, indent=2)
+        return f"Thought: I know what to respond.\nAction:\n```\n{blob}\n```"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respond(messages)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        for i, token in enumerate(re.findall(r"\S+\s*|\s+", self.respond(messages))):
+            if i:
+                time.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from telemetry import TOKEN_BUCKETS, count, observe
+
+
+def _token_usage(response: LLMResult) -> Dict[str, int]:
+    """Input/output token counts from the message usage metadata or the provider's llm_output"""
+    usage = {"input": 0, "output": 0}
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            usage["input"] += metadata.get("input_tokens", 0)
+            usage["output"] += metadata.get("output_tokens", 0)
+    if not any(usage.values()):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        usage["input"] = token_usage.get("prompt_tokens", 0)
+        usage["output"] = token_usage.get("completion_tokens", 0)
+    return usage
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """
+    Times every tool and LLM call made through LangChain (agent steps and direct
+    routes alike) and records LLM token usage. Stateless apart from the start
+    times of runs in progress, so one instance serves every session.
+    """
+
+    def __init__(self):
+        self._started: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str):
+        with self._lock:
+            self._started[run_id] = (name, time.perf_counter())
+
+    def _finish(self, run_id: UUID, error: bool = False):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        name, start = started
+        observe("span_duration_seconds", time.perf_counter() - start, span=name)
+        if error:
+            count("span_errors_total", span=name)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, f"tool.{(serialized or {}).get('name') or kwargs.get('name', 'unknown')}")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=True)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, "llm.call")
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, "llm.call")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+        usage = _token_usage(response)
+        for kind, tokens in usage.items():
+            if tokens:
+                count("llm_tokens_total", tokens, type=kind)
+        if usage["input"]:
+            observe("llm_prompt_tokens", usage["input"], buckets=TOKEN_BUCKETS)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=True)
@@ -0,0 +1,197 @@
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from chatbot.result_shaping import estimate_tokens
+from chatbot.router import find_customer_ids
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PATTERN = re.compile(r"\b(critical|high|medium|low)\s+priority\b", re.IGNORECASE)
+
+# Longest a single message may be inside the window; longer ones are cut
+MAX_MESSAGE_TOKENS = 600
+MAX_ENTITIES_PER_KIND = 5
+
+SUMMARY_PROMPT = """Update the running summary of a customer service conversation.
+Keep customer IDs, order details, products and user preferences; drop small talk.
+Answer with the new summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}"""
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " ..."
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s|\n", text.strip(), maxsplit=1)[0]
+    return sentence[:max_chars]
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history for the agent prompt.
+
+    The most recent turns are kept verbatim as long as they fit max_tokens; older
+    turns are folded into a running summary, written by the LLM when one is given
+    and extracted from the first sentence of each message otherwise. Customer IDs,
+    priority levels and products seen so far are tracked separately so they survive
+    summarisation.
+
+    Every call to prompt() records the prompt size, so turn_stats shows whether the
+    cost stays flat over a long chat.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        llm=None,
+        max_tokens: int = 1500,
+        summary_max_tokens: int = 300,
+        min_turns: int = 1,
+    ):
+        self.system_prompt = system_prompt
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.min_turns = min_turns
+        self.summary = ""
+        self.turns: List[Tuple[HumanMessage, Optional[AIMessage]]] = []
+        self.entities: Dict[str, "OrderedDict[str, None]"] = {
+            "customer_ids": OrderedDict(),
+            "priorities": OrderedDict(),
+            "products": OrderedDict(),
+        }
+        self.turn_stats: List[Dict[str, int]] = []
+        self.summarised_turns = 0
+
+    def is_empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def add_user(self, text: str):
+        self._extract_entities(text)
+        self.turns.append((HumanMessage(content=_clip(text, MAX_MESSAGE_TOKENS)), None))
+
+    def add_ai(self, text: str):
+        message = AIMessage(content=_clip(text, MAX_MESSAGE_TOKENS))
+        if self.turns and self.turns[-1][1] is None:
+            self.turns[-1] = (self.turns[-1][0], message)
+        else:
+            self.turns.append((HumanMessage(content=""), message))
+        self._compact()
+
+    def remember(self, kind: str, value: str):
+        """Record an entity, e.g. a product returned by a tool"""
+        seen = self.entities.setdefault(kind, OrderedDict())
+        seen.pop(value, None)
+        seen[value] = None
+        while len(seen) > MAX_ENTITIES_PER_KIND:
+            seen.popitem(last=False)
+
+    def _extract_entities(self, text: str):
+        for customer_id in find_customer_ids(text):
+            self.remember("customer_ids", customer_id)
+        for priority in PRIORITY_PATTERN.findall(text):
+            self.remember("priorities", priority.lower())
+
+    def context(self) -> str:
+        """Summary and entities as a single system message body"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        known = [
+            f"{kind.replace('_', ' ')}: {', '.join(values)}"
+            for kind, values in self.entities.items() if values
+        ]
+        if known:
+            parts.append("Known from this conversation - " + "; ".join(known))
+        return "\n".join(parts)
+
+    def messages(self) -> List[BaseMessage]:
+        result: List[BaseMessage] = [SystemMessage(content=self.system_prompt)]
+        context = self.context()
+        if context:
+            result.append(SystemMessage(content=context))
+        for human, ai in self.turns:
+            if human.content:
+                result.append(human)
+            if ai is not None:
+                result.append(ai)
+        return result
+
+    def prompt(self) -> List[BaseMessage]:
+        """Messages to send for the current turn, recording their token count"""
+        messages = self.messages()
+        self.turn_stats.append({
+            "turn": len(self.turn_stats) + 1,
+            "prompt_tokens": sum(estimate_tokens(str(m.content)) for m in messages),
+            "window_turns": len(self.turns),
+            "summary_tokens": estimate_tokens(self.summary),
+        })
+        return messages
+
+    def _turn_tokens(self, turn: Tuple[HumanMessage, Optional[AIMessage]]) -> int:
+        return sum(estimate_tokens(str(m.content)) for m in turn if m is not None)
+
+    def _compact(self):
+        """Fold the oldest turns into the summary until the window fits the budget"""
+        window = sum(self._turn_tokens(turn) for turn in self.turns)
+        evicted = []
+        while window > self.max_tokens and len(self.turns) > self.min_turns:
+            turn = self.turns.pop(0)
+            window -= self._turn_tokens(turn)
+            evicted.append(turn)
+        if evicted:
+            self.summary = self._summarise(evicted)
+            self.summarised_turns += len(evicted)
+
+    def _summarise(self, turns: List[Tuple[HumanMessage, Optional[AIMessage]]]) -> str:
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+            for turn in turns for m in turn if m is not None and m.content
+        )
+        if self.llm is not None:
+            try:
+                response = self.llm.invoke(SUMMARY_PROMPT.format(
+                    max_words=self.summary_max_tokens * 3 // 4,
+                    summary=self.summary or "(none)",
+                    transcript=transcript,
+                ))
+                return _clip(str(response.content).strip(), self.summary_max_tokens)
+            except Exception as e:
+                logger.warning(f"Summarising the conversation failed, using extractive summary: {e}")
+        lines = [
+            f"{'User asked' if isinstance(m, HumanMessage) else 'Assistant said'}: {_first_sentence(str(m.content))}"
+            for turn in turns for m in turn if m is not None and m.content
+        ]
+        summary = " ".join(filter(None, [self.summary] + lines))
+        # Keep the most recent part when the extractive summary outgrows its budget
+        max_chars = self.summary_max_tokens * 4
+        return summary[-max_chars:] if len(summary) > max_chars else summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turn_stats,
+            "window_turns": len(self.turns),
+            "summarised_turns": self.summarised_turns,
+            "summary_tokens": estimate_tokens(self.summary),
+        }
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+        for values in self.entities.values():
+            values.clear()
+        self.turn_stats = []
+        self.summarised_turns = 0
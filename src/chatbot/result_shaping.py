@@ -0,0 +1,185 @@
+import math
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+# Columns shown when a result is too large to list in full
+ORDER_SUMMARY_COLUMNS = [
+    "Order_Date", "Time", "Customer_Id", "Product_Category", "Product",
+    "Sales", "Quantity", "Profit", "Order_Priority",
+]
+# Up to this many orders are shown with every column and no summary
+DETAIL_ROWS = 5
+RECENT_ROWS = 10
+# Sample size used to estimate the size of the unshaped output
+RAW_SAMPLE_ROWS = 50
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count, about 4 characters per token"""
+    return math.ceil(len(text) / 4)
+
+
+def render_table(rows: Sequence[Dict[str, Any]], columns: Sequence[str]) -> str:
+    """Pipe-separated table with a single header line"""
+    lines = [" | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join(_format_value(row.get(c, "")) for c in columns))
+    return "\n".join(lines)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _order_key(row: Dict[str, Any]):
+    return str(row.get("Order_Date", "")), str(row.get("Time", ""))
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ToolOutputShaper:
+    """
+    Keeps tool outputs small enough for the prompt.
+
+    Small order sets are rendered as a table with every column. Large ones are
+    summarised (counts, totals, categories, date range) followed by the most
+    recent orders with only the relevant columns. Every output is cut to the
+    tool's token budget; what does not fit is kept behind a continuation handle
+    that the get_more_results tool can page through.
+
+    Token savings against the previous raw output are tracked per tool.
+    """
+
+    def __init__(
+        self,
+        default_budget: int = 800,
+        budgets: Optional[Dict[str, int]] = None,
+        max_continuations: int = 32,
+    ):
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.max_continuations = max_continuations
+        self._continuations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def budget(self, tool: str) -> int:
+        return self.budgets.get(tool, self.default_budget)
+
+    def shape_orders(self, tool: str, title: str, orders: List[Dict[str, Any]]) -> str:
+        if len(orders) <= DETAIL_ROWS:
+            columns = list(orders[0].keys()) if orders else []
+            text = f"{title}:\n{render_table(orders, columns)}"
+            return self._record(tool, self._raw_tokens(title, orders), self.fit(tool, text))
+
+        recent = sorted(orders, key=_order_key, reverse=True)
+        header = f"{title}:\n{self.summarise(orders)}\n\nMost recent orders:"
+        text = self._paginate(tool, header, recent, ORDER_SUMMARY_COLUMNS, limit=RECENT_ROWS)
+        return self._record(tool, self._raw_tokens(title, orders), text)
+
+    def summarise(self, orders: List[Dict[str, Any]]) -> str:
+        """Counts and totals over the whole set"""
+        dates = [str(o.get("Order_Date", "")) for o in orders if o.get("Order_Date")]
+        categories = Counter(str(o.get("Product_Category", "")) for o in orders)
+        top = ", ".join(f"{name} ({count})" for name, count in categories.most_common(5))
+        lines = [
+            f"Total orders: {len(orders)}",
+            f"Total sales: {sum(_number(o.get('Sales')) for o in orders):,.2f}",
+            f"Total profit: {sum(_number(o.get('Profit')) for o in orders):,.2f}",
+            f"Top categories: {top}",
+        ]
+        if dates:
+            lines.append(f"Date range: {min(dates)} to {max(dates)}")
+        return "\n".join(lines)
+
+    def shape_text(self, tool: str, text: str) -> str:
+        """Fit free-form tool output to the tool's budget"""
+        return self._record(tool, estimate_tokens(text), self.fit(tool, text))
+
+    def fit(self, tool: str, text: str) -> str:
+        """Cut text at a line boundary so it fits the tool's budget"""
+        budget = self.budget(tool)
+        if estimate_tokens(text) <= budget:
+            return text
+        kept = []
+        used = 0
+        for line in text.split("\n"):
+            cost = estimate_tokens(line + "\n")
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(kept) + "\n(truncated to fit the response budget)"
+
+    def more(self, handle: str) -> str:
+        """Next page of a result that did not fit"""
+        state = self._continuations.pop(handle, None)
+        if state is None:
+            return f"No more results available for handle '{handle}'"
+        text = self._paginate(state["tool"], "Next orders:", state["rows"], state["columns"])
+        return self._record("get_more_results", estimate_tokens(text), text)
+
+    def _paginate(self, tool: str, header: str, rows: List[Dict[str, Any]], columns: Sequence[str],
+                  limit: Optional[int] = None) -> str:
+        """Header plus as many table rows as fit the budget, with a handle for the rest"""
+        budget = self.budget(tool)
+        # Leave room for the continuation note
+        used = estimate_tokens(header) + estimate_tokens(" | ".join(columns)) + 40
+        lines = [header, " | ".join(columns)]
+        shown = 0
+        for row in rows[:limit] if limit else rows:
+            line = " | ".join(_format_value(row.get(c, "")) for c in columns)
+            cost = estimate_tokens(line + "\n")
+            if shown and used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+            shown += 1
+        remaining = rows[shown:]
+        if remaining:
+            handle = self._store(tool, remaining, columns)
+            lines.append(
+                f"More available: {len(remaining)} more orders. "
+                f"Call get_more_results with handle '{handle}' if the user needs them."
+            )
+        return "\n".join(lines)
+
+    def _store(self, tool: str, rows: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+        handle = uuid.uuid4().hex[:8]
+        self._continuations[handle] = {"tool": tool, "rows": rows, "columns": list(columns)}
+        while len(self._continuations) > self.max_continuations:
+            self._continuations.popitem(last=False)
+        return handle
+
+    @staticmethod
+    def _raw_tokens(title: str, orders: List[Dict[str, Any]]) -> int:
+        """Tokens the unshaped f"{title}:\\n{orders}" output would have used, estimated from a sample"""
+        if len(orders) <= RAW_SAMPLE_ROWS:
+            return estimate_tokens(f"{title}:\n{orders}")
+        sample = estimate_tokens(str(orders[:RAW_SAMPLE_ROWS]))
+        return estimate_tokens(title) + sample * len(orders) // RAW_SAMPLE_ROWS
+
+    def _record(self, tool: str, raw_tokens: int, text: str) -> str:
+        stats = self.stats.setdefault(tool, {"calls": 0, "raw_tokens": 0, "shaped_tokens": 0})
+        stats["calls"] += 1
+        stats["raw_tokens"] += raw_tokens
+        stats["shaped_tokens"] += estimate_tokens(text)
+        return text
+
+    def savings(self) -> Dict[str, Any]:
+        """Prompt tokens saved per tool and overall"""
+        per_tool = {
+            tool: {**s, "saved_tokens": s["raw_tokens"] - s["shaped_tokens"]}
+            for tool, s in self.stats.items()
+        }
+        return {
+            "tools": per_tool,
+            "saved_tokens": sum(s["saved_tokens"] for s in per_tool.values()),
+        }
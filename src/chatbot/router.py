@@ -0,0 +1,199 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+PRIORITIES = ("critical", "high", "medium", "low")
+
+_NOT_AMOUNT = r"(?<![\d$.])\b(\d{%s,7})\b(?!\.\d)(?!\s*(?:\$|dollars|usd|stars?))"
+# An ID introduced explicitly: "customer id 37077", "order number: 4521", "#37077"
+ORDER_ID_PATTERN = re.compile(
+    r"(?:\b(?:customer|client|order|purchase)\s+(?:id|number|no\.?)|\b(?:customer|client|order|purchase)\s*#|(?<!\w)#)"
+    r"\s*(?:is\s+|:\s*)?" + _NOT_AMOUNT % 3,
+    re.IGNORECASE,
+)
+# Otherwise a number of 4+ digits near the noun "order"/"customer"; prices and ratings are excluded
+ORDER_PATTERN = re.compile(r"\b(?:order|orders|customer|client|purchase)\b\D{0,15}?" + _NOT_AMOUNT % 4, re.IGNORECASE)
+# "order" used as a verb ("can I order 2000 picks") introduces a quantity, not an ID
+ORDER_VERB_PATTERN = re.compile(r"\b(?:to|i|we|you|can|could|would|will|please|want|like)\s+order$", re.IGNORECASE)
+PRIORITY_PATTERN = re.compile(
+    r"\b(critical|high|medium|low)\b[\s-]+priority\b(?!\s+(?:shipping|delivery|support|mail))"
+    r"|\bpriority\b\W{0,3}(critical|high|medium|low)\b",
+    re.IGNORECASE,
+)
+# "orders over 5000" is a threshold, not an ID
+COMPARISON_PATTERN = re.compile(r"\b(?:over|under|above|below|than|between|up to|at least|at most)\b", re.IGNORECASE)
+# "orders from 2019" names a year, not a customer
+YEAR_CONTEXT_PATTERN = re.compile(r"\b(?:from|in|since|before|after|during|until|till|of)\s+$", re.IGNORECASE)
+YEAR_PATTERN = re.compile(r"(?:19|20)\d\d")
+ORDERS_WORD_PATTERN = re.compile(r"\borders?\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(_NOT_AMOUNT % 3, re.IGNORECASE)
+PRIORITY_WORD_PATTERN = re.compile(r"\b(critical|high|medium|low)\b", re.IGNORECASE)
+# Questions that lean on earlier turns ("the second one", "cheaper than that") need the agent
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|those|these|them|this one|the (?:first|second|third|last|same|other) one|previous|above|earlier)\b",
+    re.IGNORECASE,
+)
+
+# A handful of labelled utterances per intent; queries are classified by their nearest centroid
+EXAMPLES: Dict[str, List[str]] = {
+    "get_order": [
+        "what is the status of my order",
+        "where is my order",
+        "show me the details of my purchase",
+        "when was my order placed",
+        "I want to check my order information",
+        "what did I buy last time",
+    ],
+    "get_orders_by_priority": [
+        "show critical priority orders",
+        "list all high priority orders",
+        "which orders have medium priority",
+        "orders with low priority",
+        "how many urgent orders are there",
+    ],
+    "search_products": [
+        "what are the best-rated guitars",
+        "recommend a good microphone",
+        "show me headphones under 100 dollars",
+        "I am looking for a keyboard with good reviews",
+        "find cheap amplifiers",
+        "which drum kit should I buy",
+        "do you have acoustic guitar strings",
+    ],
+    "other": [
+        "hello",
+        "thanks for your help",
+        "what can you do",
+        "how do returns work",
+        "can I talk to a human",
+        "what is your refund policy",
+    ],
+}
+
+
+def _is_year(query: str, match: re.Match) -> bool:
+    return bool(YEAR_PATTERN.fullmatch(match.group(1)) and YEAR_CONTEXT_PATTERN.search(query[:match.start(1)]))
+
+
+def find_customer_ids(text: str) -> List[str]:
+    """
+    Customer IDs a text clearly names: after an explicit marker ("customer id",
+    "order #"), or as 4+ digits after the noun "order"/"customer". Prices,
+    quantities, thresholds and years are not IDs.
+    """
+    found = [match.group(1) for match in ORDER_ID_PATTERN.finditer(text)]
+    for match in ORDER_PATTERN.finditer(text):
+        keyword_end = match.start() + len(re.match(r"\w+", match.group(0)).group(0))
+        gap = text[keyword_end:match.start(1)]
+        if ORDER_VERB_PATTERN.search(text[:keyword_end]) or COMPARISON_PATTERN.search(gap) or _is_year(text, match):
+            continue
+        found.append(match.group(1))
+    return list(dict.fromkeys(found))
+
+
+@dataclass
+class Route:
+    """Where a query goes: a tool with its input, or the agent (tool is None)"""
+    tool: Optional[str]
+    tool_input: Dict[str, Any] = field(default_factory=dict)
+    intent: str = "other"
+    confidence: float = 0.0
+    source: str = "agent"
+
+    @property
+    def is_direct(self) -> bool:
+        return self.tool is not None
+
+
+class IntentClassifier:
+    """Nearest-centroid classifier over sentence embeddings of the EXAMPLES utterances"""
+
+    def __init__(self, embed_fn: Callable[[str], np.ndarray], examples: Dict[str, List[str]] = EXAMPLES):
+        self.embed_fn = embed_fn
+        self.intents = list(examples)
+        centroids = []
+        for intent in self.intents:
+            vectors = np.stack([self._unit(embed_fn(text)) for text in examples[intent]])
+            centroids.append(self._unit(vectors.mean(axis=0)))
+        self.centroids = np.stack(centroids)
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, query: str) -> Dict[str, float]:
+        similarities = self.centroids @ self._unit(self.embed_fn(query))
+        return dict(zip(self.intents, similarities.tolist()))
+
+    def classify(self, query: str):
+        """(intent, cosine similarity, margin over the runner-up)"""
+        scores = sorted(self.scores(query).items(), key=lambda item: item[1], reverse=True)
+        (intent, best), (_, second) = scores[0], scores[1]
+        return intent, best, best - second
+
+
+class IntentRouter:
+    """
+    Sends obvious lookups straight to a tool instead of through the ReAct agent.
+
+    Keyword rules catch queries that clearly name an order/customer ID, or a
+    priority level of orders.
+    Everything else goes through the embedding classifier, which must clear both
+    min_similarity and min_margin, and must still find the tool's argument in the
+    query. Follow-ups that refer to earlier turns, and anything below the
+    thresholds, go to the agent.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], np.ndarray]] = None,
+        min_similarity: float = 0.45,
+        min_margin: float = 0.05,
+    ):
+        self.classifier = IntentClassifier(embed_fn) if embed_fn is not None else None
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+
+    def route(self, query: str) -> Route:
+        customer_id = self._order_id(query)
+        if customer_id:
+            return Route("get_order", {"customer_id": customer_id}, "get_order", 1.0, "rule")
+        match = PRIORITY_PATTERN.search(query)
+        if match and ORDERS_WORD_PATTERN.search(query):
+            priority = (match.group(1) or match.group(2)).lower()
+            return Route("get_orders_by_priority", {"priority": priority}, "get_orders_by_priority", 1.0, "rule")
+
+        if self.classifier is None or FOLLOW_UP_PATTERN.search(query):
+            return Route(None)
+        intent, similarity, margin = self.classifier.classify(query)
+        if similarity < self.min_similarity or margin < self.min_margin:
+            return Route(None, intent=intent, confidence=similarity)
+
+        tool_input = self._tool_input(intent, query)
+        if tool_input is None:
+            return Route(None, intent=intent, confidence=similarity)
+        return Route(intent, tool_input, intent, similarity, "classifier")
+
+    @staticmethod
+    def _order_id(query: str) -> Optional[str]:
+        """Customer ID the query clearly names, if any; ambiguous numbers are left to the classifier"""
+        customer_ids = find_customer_ids(query)
+        return customer_ids[0] if customer_ids else None
+
+    @staticmethod
+    def _tool_input(intent: str, query: str) -> Optional[Dict[str, Any]]:
+        if intent == "get_order":
+            numbers = [m.group(1) for m in NUMBER_PATTERN.finditer(query)
+                       if not COMPARISON_PATTERN.search(query[max(m.start() - 15, 0):m.start()])
+                       and not _is_year(query, m)]
+            return {"customer_id": numbers[0]} if len(numbers) == 1 else None
+        if intent == "get_orders_by_priority":
+            words = {w.lower() for w in PRIORITY_WORD_PATTERN.findall(query)}
+            return {"priority": words.pop()} if len(words) == 1 else None
+        if intent == "search_products":
+            return {"query": query}
+        return None
@@ -0,0 +1,112 @@
+import logging
+import queue
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Chat models only stream through callbacks when a handler of this type is attached.
+    # It is private to langchain-core; environment.yml pins the versions that have it
+    # and tests/test_streaming.py checks tokens still arrive one by one.
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+    _STREAMING_BASES = (_StreamingCallbackHandler,)
+except ImportError:
+    logger.warning("This langchain-core has no streaming callback handler; agent answers will arrive in one piece")
+    _STREAMING_BASES = ()
+
+FINAL_ANSWER_START = re.compile(r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"')
+JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class FinalAnswerExtractor:
+    """
+    Incrementally pulls the text of a ReAct "Final Answer" action out of the JSON
+    blob the structured chat agent streams, decoding string escapes as it goes.
+    Tokens of tool-selecting LLM calls produce nothing.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position: Optional[int] = None
+        self.done = False
+
+    def feed(self, token: str) -> str:
+        if self.done:
+            return ""
+        self.buffer += token
+        if self.position is None:
+            match = FINAL_ANSWER_START.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+
+        buffer, i, out = self.buffer, self.position, []
+        while i < len(buffer):
+            char = buffer[i]
+            if char == "\\":
+                if i + 1 >= len(buffer):
+                    break
+                escaped = buffer[i + 1]
+                if escaped == "u":
+                    # Wait for all four hex digits
+                    if i + 6 > len(buffer):
+                        break
+                    try:
+                        out.append(chr(int(buffer[i + 2:i + 6], 16)))
+                    except ValueError:
+                        out.append(buffer[i:i + 6])
+                    i += 6
+                    continue
+                out.append(JSON_ESCAPES.get(escaped, escaped))
+                i += 2
+                continue
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            out.append(char)
+            i += 1
+        self.position = i
+        return "".join(out)
+
+
+class AgentStreamHandler(BaseCallbackHandler, *_STREAMING_BASES):
+    """
+    Turns agent callbacks into events on a queue:
+    {"type": "token", "text": ...} for pieces of the final answer,
+    {"type": "tool_start", "tool": ..., "input": ...} and {"type": "tool_end", "tool": ...}
+    """
+
+    def __init__(self, events: "queue.Queue[Dict[str, Any]]"):
+        self.events = events
+        self.extractor = FinalAnswerExtractor()
+        self.streamed = False
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any):
+        self.extractor = FinalAnswerExtractor()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any):
+        self.extractor = FinalAnswerExtractor()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any):
+        text = self.extractor.feed(token)
+        if text:
+            self.streamed = True
+            self.events.put({"type": "token", "text": text})
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name", "tool")
+        self.events.put({"type": "tool_start", "tool": name, "input": input_str})
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": kwargs.get("name", "tool")})
+
+    # Pass-through hooks required by the streaming handler interface
+    def tap_output_iter(self, run_id, output):
+        return output
+
+    def tap_output_aiter(self, run_id, output):
+        return output
@@ -0,0 +1,165 @@
+"""
+Typed, columnar copies of the CSV datasets.
+
+convert() writes a CSV once as an uncompressed Arrow IPC (Feather v2) file next
+to it: numeric columns typed, low-cardinality text dictionary-encoded, record
+batches of a fixed size. read_dataset() then memory-maps that file and reads
+only the requested columns, falling back to the CSV when no up-to-date Arrow
+file exists or pyarrow is not installed. iter_batches() walks the file one
+record batch at a time for out-of-core processing.
+
+    python src/columnar.py data/Order_Data_Dataset.csv data/Product_Information_Dataset.csv
+"""
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARROW_SUFFIX = ".arrow"
+BATCH_ROWS = 64_000
+
+# Column types per dataset; columns not listed stay plain strings
+NUMERIC_COLUMNS = {
+    "orders": ["Aging", "Customer_Id", "Sales", "Quantity", "Discount", "Profit", "Shipping_Cost"],
+    "products": ["average_rating", "rating_number", "price"],
+}
+CATEGORICAL_COLUMNS = {
+    "orders": ["Gender", "Device_Type", "Customer_Login_type", "Product_Category", "Product",
+               "Order_Priority", "Payment_method"],
+    "products": ["main_category", "store"],
+}
+
+
+def arrow_path(csv_path: Union[str, Path]) -> Path:
+    return Path(csv_path).with_suffix(ARROW_SUFFIX)
+
+
+def dataset_kind(columns: Sequence[str]) -> Optional[str]:
+    if "Order_Priority" in columns:
+        return "orders"
+    if "parent_asin" in columns:
+        return "products"
+    return None
+
+
+def typed(df: pd.DataFrame, kind: Optional[str] = None) -> pd.DataFrame:
+    """Numeric columns as numbers and low-cardinality text as categoricals"""
+    kind = kind or dataset_kind(df.columns)
+    df = df.copy()
+    for column in NUMERIC_COLUMNS.get(kind, []):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    for column in CATEGORICAL_COLUMNS.get(kind, []):
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def convert(csv_path: Union[str, Path], out_path: Optional[Union[str, Path]] = None,
+            batch_rows: int = BATCH_ROWS) -> Path:
+    """
+    Write csv_path as an uncompressed Arrow IPC file. The CSV is parsed in full once
+    so every record batch shares one dictionary per categorical column.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    csv_path = Path(csv_path)
+    out_path = Path(out_path) if out_path else arrow_path(csv_path)
+    start = time.perf_counter()
+    df = typed(pd.read_csv(csv_path))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Uncompressed, so readers can memory-map the buffers instead of decoding them
+    feather.write_feather(table, out_path, compression="uncompressed", chunksize=batch_rows)
+    logger.info(f"Converted {csv_path} ({len(df)} rows) to {out_path} in {time.perf_counter() - start:.1f} s")
+    return out_path
+
+
+def is_current(path: Path, csv_path: Path) -> bool:
+    """Arrow file exists and is at least as new as the CSV it was built from"""
+    if not path.exists():
+        return False
+    return not csv_path.exists() or path.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def read_dataset(csv_path: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    The dataset as a DataFrame, restricted to columns if given. Read from the
+    memory-mapped Arrow copy when it is current, otherwise from the CSV.
+    """
+    csv_path = Path(csv_path)
+    path = arrow_path(csv_path)
+    if is_current(path, csv_path):
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            logger.warning(f"{path} exists but pyarrow is not installed; reading {csv_path}")
+        else:
+            table = feather.read_table(path, columns=columns, memory_map=True)
+            # Numeric columns without nulls are handed to pandas without copying
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+    return pd.read_csv(csv_path, usecols=columns)
+
+
+def iter_batches(path: Union[str, Path], columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Record batches of an Arrow file as DataFrames, one at a time"""
+    import pyarrow as pa
+
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield batch.to_pandas()
+
+
+def batch_count(path: Union[str, Path]) -> int:
+    import pyarrow as pa
+
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).num_record_batches
+
+
+def read_batch(path: Union[str, Path], index: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """A single record batch of an Arrow file, so separate processes can each map their own"""
+    import pyarrow as pa
+
+    with pa.memory_map(str(path)) as source:
+        batch = pa.ipc.open_file(source).get_batch(index)
+        if columns is not None:
+            batch = batch.select(columns)
+        return batch.to_pandas()
+
+
+def iter_chunks(csv_path: Union[str, Path], chunksize: int = BATCH_ROWS,
+                columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Dataset in chunks, from the Arrow copy when current, otherwise from the CSV"""
+    csv_path = Path(csv_path)
+    path = arrow_path(csv_path)
+    if is_current(path, csv_path):
+        try:
+            yield from iter_batches(path, columns)
+            return
+        except ImportError:
+            logger.warning(f"{path} exists but pyarrow is not installed; reading {csv_path}")
+    yield from pd.read_csv(csv_path, chunksize=chunksize, usecols=columns)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Convert dataset CSVs to memory-mappable Arrow files")
+    parser.add_argument("csv", nargs="+")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+    for csv_path in args.csv:
+        convert(csv_path, batch_rows=args.batch_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from product_table import ProductTable, unique_products
+from telemetry import traced
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be best by for from good i in is it me my of on or "
+    "show some than that the this to under what which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted BM25 index over product text. Per-posting weights are precomputed at
+    build time, so scoring a query is one vectorized add per query term.
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        term_rows: Dict[str, List[int]] = defaultdict(list)
+        term_tfs: Dict[str, List[int]] = defaultdict(list)
+        doc_len = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_rows[term].append(row)
+                term_tfs[term].append(tf)
+
+        self.n_docs = len(doc_len)
+        doc_len = np.asarray(doc_len, dtype=np.float32)
+        avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.zeros_like(doc_len)
+
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, rows in term_rows.items():
+            rows = np.asarray(rows, dtype=np.int32)
+            tf = np.asarray(term_tfs[term], dtype=np.float32)
+            idf = np.log(1 + (self.n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            self.postings[term] = (rows, (idf * tf * (k1 + 1) / (tf + norm[rows])).astype(np.float32))
+
+    @traced("search.bm25")
+    def search(self, query: str, k: int = 5, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs, restricted to rows where mask is True"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weights
+                matched = True
+        if not matched:
+            return []
+        if mask is not None:
+            scores[~mask] = 0.0
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+@dataclass
+class ProductFilter:
+    """Hard constraints applied to the catalog before any scoring"""
+    categories: List[str] = field(default_factory=list)
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not self.categories and self.min_price is None and self.max_price is None and self.min_rating is None
+
+    def mask(self, table: ProductTable) -> np.ndarray:
+        """Boolean mask over the table's rows, computed on its columnar arrays"""
+        mask = np.ones(len(table), dtype=bool)
+        if self.categories:
+            wanted = {c.lower() for c in self.categories}
+            codes = [code for code, name in enumerate(table.categories) if name.lower() in wanted]
+            mask &= np.isin(table.category_codes, codes)
+        # NaN prices and ratings never satisfy a bound
+        if self.min_price is not None:
+            mask &= table.price >= self.min_price
+        if self.max_price is not None:
+            mask &= table.price <= self.max_price
+        if self.min_rating is not None:
+            mask &= table.average_rating >= self.min_rating
+        return mask
+
+    def describe(self) -> str:
+        parts = []
+        if self.categories:
+            parts.append(f"category in {', '.join(self.categories)}")
+        if self.min_price is not None:
+            parts.append(f"price >= ${self.min_price:g}")
+        if self.max_price is not None:
+            parts.append(f"price <= ${self.max_price:g}")
+        if self.min_rating is not None:
+            parts.append(f"rating >= {self.min_rating:g}")
+        return "; ".join(parts)
+
+
+_NUMBER = r"\$?\s*(\d+(?:\.\d+)?)"
+_PRICE_BETWEEN = re.compile(rf"between\s+{_NUMBER}\s+(?:and|to)\s+{_NUMBER}|\$(\d+(?:\.\d+)?)\s*-\s*\$?(\d+(?:\.\d+)?)")
+_PRICE_MAX = re.compile(rf"(?:under|below|less than|cheaper than|up to|no more than|max(?:imum)?|at most)\s+{_NUMBER}(?![\d.]|\s*stars?)")
+_PRICE_MIN = re.compile(rf"(?:over|above|more than|at least|min(?:imum)?)\s+{_NUMBER}(?![\d.]|\s*stars?)")
+_RATING_MIN = re.compile(r"(?<![\d.])(\d(?:\.\d)?)\s*\+?\s*stars?")
+_HIGHLY_RATED = re.compile(r"\b(?:best|top|highly|high)[\s-]+rated\b")
+# What "best rated" means when no explicit star count is given
+HIGHLY_RATED_MIN = 4.0
+
+
+def parse_filters(query: str, categories: Sequence[str] = (), ranges: Optional[Dict[str, Any]] = None) -> ProductFilter:
+    """
+    Extract price, rating and category constraints from a natural-language query,
+    e.g. "best-rated guitars under $200". ranges are the catalog's filter ranges
+    from its profile report (ProductRAG.filter_ranges): bounds every product already
+    satisfies are dropped, and its categories are used when none are given.
+    """
+    ranges = ranges or {}
+    text = query.lower()
+    filters = ProductFilter()
+
+    between = _PRICE_BETWEEN.search(text)
+    if between:
+        low, high = [float(g) for g in between.groups() if g is not None]
+        filters.min_price, filters.max_price = min(low, high), max(low, high)
+    else:
+        if match := _PRICE_MAX.search(text):
+            filters.max_price = float(match.group(1))
+        if match := _PRICE_MIN.search(text):
+            filters.min_price = float(match.group(1))
+
+    if match := _RATING_MIN.search(text):
+        filters.min_rating = float(match.group(1))
+    elif _HIGHLY_RATED.search(text):
+        filters.min_rating = HIGHLY_RATED_MIN
+
+    filters.categories = [c for c in categories or ranges.get("categories", ()) if c and c.lower() in text]
+    return _drop_vacuous_bounds(filters, ranges)
+
+
+def _drop_vacuous_bounds(filters: ProductFilter, ranges: Dict[str, Any]) -> ProductFilter:
+    """
+    Remove bounds outside the catalog's range ("under $100000"): they exclude
+    nothing but products with no price or rating
+    """
+    price, rating = ranges.get("price") or {}, ranges.get("average_rating") or {}
+    if filters.min_price is not None and price.get("min") is not None and filters.min_price <= price["min"]:
+        filters.min_price = None
+    if filters.max_price is not None and price.get("max") is not None and filters.max_price >= price["max"]:
+        filters.max_price = None
+    if filters.min_rating is not None and rating.get("min") is not None and filters.min_rating <= rating["min"]:
+        filters.min_rating = None
+    return filters
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists; each list contributes 1 / (k + rank) per ID"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridSearcher:
+    """
+    Dense (FAISS) plus sparse (BM25) product retrieval fused with reciprocal-rank
+    fusion, with metadata filters applied before either retriever scores anything.
+    """
+
+    def __init__(self, rag, table: ProductTable, bm25: BM25Index, fetch_k: int = 50, rrf_k: int = 60):
+        self.rag = rag
+        self.table = table
+        self.bm25 = bm25
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+
+    @classmethod
+    def from_dataframe(cls, rag, df_products: pd.DataFrame, table: Optional[ProductTable] = None, **kwargs):
+        """Build the BM25 index over title and description, aligned with the table's rows"""
+        if table is None:
+            table = ProductTable(df_products, id_column=rag.id_column)
+        df, _ = unique_products(df_products, rag.id_column)
+        texts = df['title'].fillna('').astype(str) + " " + df['description'].fillna('').astype(str)
+        return cls(rag, table, BM25Index(texts), **kwargs)
+
+    @traced("search.hybrid")
+    def search(self, query: str, k: int = 5, filters: Optional[ProductFilter] = None) -> List[Tuple[str, float]]:
+        """Top-k (product_id, fused score) pairs, best first"""
+        fetch_k = max(self.fetch_k, k)
+        mask = None
+        candidate_ids = None
+        if filters is not None and not filters.is_empty():
+            mask = filters.mask(self.table)
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return []
+            candidate_ids = self.table.product_ids[rows]
+
+        dense = [pid for pid, _ in self.rag.search(query, k=fetch_k, product_ids=candidate_ids)]
+        sparse = [self.table.product_ids[row] for row, _ in self.bm25.search(query, k=fetch_k, mask=mask)]
+        return reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)[:k]
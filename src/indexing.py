@@ -0,0 +1,245 @@
+import hashlib
+import logging
+import multiprocessing as mp
+import os
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from columnar import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces
+DEFAULT_MAX_SEQ_LENGTH = 256
+# Padded tokens per batch (longest text in the batch x batch size)
+DEFAULT_TOKENS_PER_BATCH = 8192
+
+
+@dataclass
+class IndexingStats:
+    """Throughput figures for one indexing run"""
+    documents: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    total_seconds: float = 0.0
+    chunks: int = 0
+    batch_sizes: List[int] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.total_seconds if self.total_seconds else 0.0
+
+    @property
+    def embed_docs_per_second(self) -> float:
+        return self.documents / self.embed_seconds if self.embed_seconds else 0.0
+
+    def __str__(self):
+        mean_batch = np.mean(self.batch_sizes) if self.batch_sizes else 0
+        return (
+            f"{self.documents} docs in {self.total_seconds:.1f}s "
+            f"({self.docs_per_second:.1f} docs/s overall, {self.embed_docs_per_second:.1f} docs/s embedding, "
+            f"{self.batches} batches, mean batch size {mean_batch:.0f})"
+        )
+
+
+def build_combined_content(df: pd.DataFrame, template: str) -> pd.Series:
+    """
+    Vectorized equivalent of template.format_map(row) for every row.
+    Only the fields named in the template are touched.
+    """
+    result = pd.Series("", index=df.index, dtype=object)
+    for literal, field_name, _, _ in string.Formatter().parse(template):
+        if literal:
+            result = result + literal
+        if field_name is not None:
+            result = result + df[field_name].astype(str)
+    return result
+
+
+def estimate_tokens(texts: Sequence[str], max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH) -> np.ndarray:
+    """
+    Cheap word-piece estimate (about 4 characters per token), capped at the
+    model's truncation length
+    """
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    return np.minimum(lengths // 4 + 2, max_seq_length)
+
+
+def token_length_batches(
+    texts: Sequence[str],
+    tokens_per_batch: int = DEFAULT_TOKENS_PER_BATCH,
+    max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH,
+) -> List[np.ndarray]:
+    """
+    Group text positions into batches of similar length so that the padded size
+    (longest text x batch size) stays under tokens_per_batch
+    """
+    if not len(texts):
+        return []
+    tokens = estimate_tokens(texts, max_seq_length)
+    order = np.argsort(tokens, kind='stable')[::-1]
+    batches = []
+    start = 0
+    while start < len(order):
+        # Sorted longest first, so the first text of the batch sets the padded width
+        width = max(int(tokens[order[start]]), 1)
+        size = max(tokens_per_batch // width, 1)
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+# Per-process embedding model, created by _init_worker
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_embeddings
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    torch.set_num_threads(threads)
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": 1024})
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+class EmbeddingPool:
+    """
+    Embeds texts across a pool of worker processes, each holding its own copy of
+    the model. With workers=1 embedding runs in-process.
+    """
+
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        workers: Optional[int] = None,
+        tokens_per_batch: int = DEFAULT_TOKENS_PER_BATCH,
+        max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH,
+        embeddings=None,
+    ):
+        """
+        embeddings: an already loaded HuggingFaceEmbeddings to reuse when running in-process
+        """
+        cpus = os.cpu_count() or 1
+        self.model_name = model_name
+        self.workers = workers or max(cpus // 2, 1)
+        self.tokens_per_batch = tokens_per_batch
+        self.max_seq_length = max_seq_length
+        self.stats = IndexingStats()
+        threads = max(cpus // self.workers, 1)
+        if self.workers > 1:
+            # spawn avoids forking a process that already has torch thread pools
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_name, threads),
+            )
+        else:
+            self._executor = None
+            if embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                embeddings = HuggingFaceEmbeddings(model_name=model_name)
+            self._local_embeddings = embeddings
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, returning vectors in input order"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        start = time.perf_counter()
+        batches = token_length_batches(texts, self.tokens_per_batch, self.max_seq_length)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        if self._executor is not None:
+            results = list(self._executor.map(_embed_batch, batch_texts))
+        else:
+            results = [
+                np.asarray(self._local_embeddings.embed_documents(b), dtype=np.float32)
+                for b in batch_texts
+            ]
+
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for batch, result in zip(batches, results):
+            vectors[batch] = result
+
+        self.stats.documents += len(texts)
+        self.stats.batches += len(batches)
+        self.stats.batch_sizes.extend(len(b) for b in batches)
+        self.stats.embed_seconds += time.perf_counter() - start
+        return vectors
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_catalog_chunks(
+    csv_path: Union[str, Path],
+    chunksize: int = 2000,
+    usecols: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the product catalog in chunks of at most chunksize rows so the full
+    catalog never sits in memory. Read from the memory-mapped Arrow copy when it
+    is current (src/columnar.py), otherwise from the CSV.
+    """
+    for batch in iter_chunks(csv_path, chunksize=chunksize, columns=list(usecols) if usecols else None):
+        for start in range(0, len(batch), chunksize):
+            yield batch.iloc[start:start + chunksize]
+
+
+def file_digest(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """sha256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+
+def main():
+    import argparse
+
+    from rag import ProductRAG
+
+    parser = argparse.ArgumentParser(description="Index the product catalog and report embedding throughput")
+    parser.add_argument('csv_path', nargs='?', default=Path(__file__).parent.parent / 'data' / 'Product_Information_Dataset.csv')
+    parser.add_argument('--cache-dir', default=None,
+                        help="Persist the index here; defaults to RAG_CACHE_DIR or data/faiss_cache next to the CSV, as the assistant uses")
+    parser.add_argument('--chunksize', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tokens-per-batch', type=int, default=DEFAULT_TOKENS_PER_BATCH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cache_dir = args.cache_dir or os.getenv("RAG_CACHE_DIR") or Path(args.csv_path).parent / 'faiss_cache'
+    rag = ProductRAG(cache_dir=cache_dir)
+    stats = rag.sync_csv(
+        args.csv_path,
+        chunksize=args.chunksize,
+        workers=args.workers,
+        tokens_per_batch=args.tokens_per_batch,
+    )
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
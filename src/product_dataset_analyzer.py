@@ -1,16 +1,27 @@
+import argparse
+from functools import lru_cache
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 
-# Config seaborn
-plt.style.use('seaborn-v0_8')  
-sns.set_theme() 
+from columnar import read_dataset
+from profiling import profile_dataset, report_path, write_report
+
+DATA_PATH = Path(__file__).parent.parent / 'data' / 'Product_Information_Dataset.csv'
+
+@lru_cache(maxsize=None)
+def _plotting():
+    """matplotlib and seaborn, imported and styled on first use rather than at import time"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Config seaborn
+    plt.style.use('seaborn-v0_8')
+    sns.set_theme()
+    return plt, sns
 
 def load_product_data():
-    """Load product data from csv file"""
-    data_path = Path(__file__).parent.parent / 'data' / 'Product_Information_Dataset.csv'
-    return pd.read_csv(data_path)
+    """Load product data, from its Arrow copy when one has been built, otherwise from the csv file"""
+    return read_dataset(DATA_PATH)
 
 def print_column_info(df):
     """Print detailed information about the columns of the dataset."""
@@ -48,6 +59,7 @@ def explore_dataset(df):
 
 def create_visualizations(df):
     """Create and save visualizations of the dataset."""
+    plt, sns = _plotting()
     # 1. Price Distribution
     plt.figure(figsize=(12, 6))
     sns.histplot(data=df, x='price', bins=50)
@@ -73,7 +85,78 @@ def create_visualizations(df):
         plt.title('Correlation Matrix')
         plt.tight_layout()
 
+def explore_profile(report):
+    """Same overview as explore_dataset, read from a chunked profile report instead of the full frame."""
+    columns = report['columns']
+    print("\n=== General Dataset Information ===")
+    print("\nDataset Dimensions:")
+    print(f"Rows: {report['rows']}, Columns: {len(columns)} (profiled in {report['chunks']} chunks)")
+
+    print("\nColumn types and approximate unique values:")
+    for col, stats in columns.items():
+        print(f"{col}: {stats['type']}, ~{stats['distinct_estimate']} unique values")
+
+    print("\nDescriptive Statistics:")
+    numeric = {col: stats for col, stats in columns.items() if stats['type'] == 'numeric'}
+    describe = pd.DataFrame({
+        col: {'count': stats['count'] - stats['nulls'], 'mean': stats['mean'], 'std': stats['std'],
+              'min': stats['min'], **stats['quantiles'], 'max': stats['max']}
+        for col, stats in numeric.items()
+    })
+    print(describe)
+
+    print("\nNull Values by Column:")
+    print(pd.Series({col: stats['nulls'] for col, stats in columns.items()}))
+
+def create_profile_visualizations(report):
+    """create_visualizations drawn from the report's histograms, value counts and correlations."""
+    plt, sns = _plotting()
+    price = report['histograms'].get('price')
+    if price:
+        plt.figure(figsize=(12, 6))
+        edges = price['edges']
+        plt.stairs(price['counts'], edges, fill=True)
+        plt.xscale('symlog', linthresh=edges[1])
+        plt.title('Price Distribution')
+        plt.xlabel('Price')
+        plt.ylabel('Frequency')
+
+    top_values = report['columns'].get('main_category', {}).get('top_values')
+    if top_values:
+        plt.figure(figsize=(15, 6))
+        names, counts = zip(*top_values)
+        sns.barplot(x=list(names), y=list(counts))
+        plt.title('Number of Products by Category')
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+
+    correlation_matrix = pd.DataFrame(report['correlation'], dtype=float)
+    if len(correlation_matrix) > 1:
+        plt.figure(figsize=(10, 8))
+        sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0)
+        plt.title('Correlation Matrix')
+        plt.tight_layout()
+
 def main():
+    parser = argparse.ArgumentParser(description="Explore the product dataset")
+    parser.add_argument('--chunked', action='store_true',
+                        help="Profile in one parallel chunked pass instead of loading the dataset into memory")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-plots', action='store_true')
+    args = parser.parse_args()
+
+    if args.chunked:
+        print("Profiling product dataset in chunks...")
+        report = profile_dataset(DATA_PATH, workers=args.workers)
+        # The report is also read back by the RAG indexer for filter ranges
+        print(f"Report written to {write_report(report, report_path(DATA_PATH))}")
+        explore_profile(report)
+        if not args.no_plots:
+            create_profile_visualizations(report)
+            plt, _ = _plotting()
+            plt.show()
+        return
+
     # Load data
     print("Loading product dataset...")
     df = load_product_data()
@@ -82,9 +165,12 @@ def main():
     explore_dataset(df)
     
 
+    if args.no_plots:
+        return
     create_visualizations(df)
     
     # Keep the visualizations open
+    plt, _ = _plotting()
     plt.show()
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def unique_products(df_products: pd.DataFrame, id_column: str = 'parent_asin') -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Rows and string IDs of df_products with duplicate IDs removed. Same rule as
+    ProductRAG: the last occurrence of a duplicate ID wins.
+    """
+    if id_column in df_products.columns:
+        product_ids = df_products[id_column].astype(str)
+    else:
+        product_ids = pd.Series(df_products.index.astype(str), index=df_products.index)
+    keep = ~product_ids.duplicated(keep='last').to_numpy()
+    return df_products.loc[keep], product_ids.to_numpy(dtype=object)[keep]
+
+
+class ProductTable:
+    """
+    Compact columnar copy of the product fields the assistant shows to the LLM,
+    addressed by the same product IDs as the FAISS docstore.
+    """
+
+    def __init__(self, df_products: pd.DataFrame, id_column: str = 'parent_asin'):
+        df, self.product_ids = unique_products(df_products, id_column)
+        self.row_of: Dict[str, int] = {pid: i for i, pid in enumerate(self.product_ids)}
+        self.title = df['title'].fillna('').astype(str).to_numpy(dtype=object)
+        categories = df['main_category'].astype(object).fillna('').astype('category')
+        self.categories = categories.cat.categories.to_numpy(dtype=object)
+        self.category_codes = categories.cat.codes.to_numpy()
+        self.price = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64)
+        self.average_rating = pd.to_numeric(df['average_rating'], errors='coerce').to_numpy(dtype=np.float32)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def rows(self, product_ids: Iterable[str]) -> List[int]:
+        """Row positions of the given IDs, skipping unknown ones"""
+        return [self.row_of[pid] for pid in product_ids if pid in self.row_of]
+
+    def category(self, row: int) -> str:
+        return self.categories[self.category_codes[row]] if self.category_codes[row] >= 0 else ''
+
+    def format_row(self, row: int, score: Optional[float] = None, score_label: str = 'distance') -> str:
+        price = self.price[row]
+        rating = self.average_rating[row]
+        parts = [
+            f"[{self.category(row)}] {self.title[row]}",
+            f"price: ${price:.2f}" if not np.isnan(price) else "price: n/a",
+            f"rating: {rating:.1f}" if not np.isnan(rating) else "rating: n/a",
+        ]
+        if score is not None:
+            parts.append(f"{score_label}: {score:.3f}")
+        return " | ".join(parts)
+
+    def format_results(self, results: Sequence[Tuple[str, float]], score_label: str = 'distance') -> str:
+        """One numbered line per (product_id, score) pair"""
+        lines = []
+        for product_id, score in results:
+            row = self.row_of.get(product_id)
+            if row is not None:
+                lines.append(f"{len(lines) + 1}. {self.format_row(row, score, score_label)}")
+        return "\n".join(lines)
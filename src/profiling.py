@@ -0,0 +1,545 @@
+"""
+Single-pass, chunked profile of a dataset that never holds more than one chunk
+per worker in memory.
+
+Every statistic is a mergeable sketch, so chunks are profiled independently on
+a process pool and the partial profiles combined afterwards:
+- distinct counts: HyperLogLog
+- quantiles: t-digest
+- mean, standard deviation and pairwise correlation: running (co-)moments
+- value distributions: histograms with fixed edges
+
+The report is written as JSON next to the dataset. Its filter_ranges section
+(price and rating ranges, categories) is what the RAG indexer reads back.
+
+    python src/profiling.py data/Product_Information_Dataset.csv --workers 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from columnar import (BATCH_ROWS, CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, arrow_path, batch_count, dataset_kind,
+                      is_current, read_batch)
+from indexing import file_digest
+
+logger = logging.getLogger(__name__)
+
+REPORT_SUFFIX = ".profile.json"
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# Four bins per decade from 1 cent to 100k; fixed so chunk histograms add up exactly
+LOG_EDGES = np.concatenate([[0.0], np.logspace(-2, 5, 29)])
+HISTOGRAM_COLUMNS = ("price", "Sales")
+# Columns whose ranges the search filters constrain
+FILTER_COLUMNS = ("price", "average_rating")
+CATEGORY_COLUMN = "main_category"
+TOP_VALUES = 20
+
+
+def _number(value) -> Optional[float]:
+    """JSON-safe float (NaN and infinities become null)"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _hashes(values: pd.Series) -> np.ndarray:
+    """64-bit hashes that agree across chunks whatever dtype each chunk was parsed as"""
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(np.float64)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Bit length of each uint64, via float log2 on 32-bit halves so it stays exact"""
+    high = (x >> np.uint64(32)).astype(np.float64)
+    low = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    high_bits = 33 + np.floor(np.log2(np.maximum(high, 1)))
+    low_bits = np.where(low > 0, 1 + np.floor(np.log2(np.maximum(low, 1))), 0)
+    return np.where(high > 0, high_bits, low_bits).astype(np.int64)
+
+
+class HyperLogLog:
+    """Distinct count estimate in 2**precision bytes, about 1.04 / sqrt(2**precision) relative error"""
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: pd.Series):
+        values = values.dropna()
+        if values.empty:
+            return
+        hashes = _hashes(values)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / empty)
+        return int(round(estimate))
+
+
+class TDigest:
+    """
+    Merging t-digest: quantile sketch whose centroids are small near the tails,
+    so extreme quantiles stay accurate with about `compression` centroids.
+    """
+
+    def __init__(self, compression: float = 200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: np.ndarray):
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: "TDigest"):
+        if not len(other.means):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        # k1 scale function: each centroid spans at most one unit of k
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        _, start = np.unique(bucket, return_index=True)
+        self.weights = np.add.reduceat(weights, start)
+        self.means = np.add.reduceat(means * weights, start) / self.weights
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means):
+            return math.nan
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * total, positions, values))
+
+
+class Moments:
+    """Count, mean, variance (Welford/Chan) and range of a numeric stream"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: np.ndarray):
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        batch = Moments()
+        batch.n = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min, batch.max = float(values.min()), float(values.max())
+        self.merge(batch)
+
+    def merge(self, other: "Moments"):
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+
+
+class CoMoments:
+    """Running covariance of two columns over the rows where both are present"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c = 0.0
+
+    def add(self, x: np.ndarray, y: np.ndarray):
+        both = np.isfinite(x) & np.isfinite(y)
+        x, y = x[both], y[both]
+        if not len(x):
+            return
+        batch = CoMoments()
+        batch.n = len(x)
+        batch.mean_x, batch.mean_y = float(x.mean()), float(y.mean())
+        dx, dy = x - batch.mean_x, y - batch.mean_y
+        batch.m2_x, batch.m2_y, batch.c = float((dx * dx).sum()), float((dy * dy).sum()), float((dx * dy).sum())
+        self.merge(batch)
+
+    def merge(self, other: "CoMoments"):
+        if not other.n:
+            return
+        n = self.n + other.n
+        dx, dy = other.mean_x - self.mean_x, other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.c += other.c + dx * dy * weight
+        self.m2_x += other.m2_x + dx * dx * weight
+        self.m2_y += other.m2_y + dy * dy * weight
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+
+    @property
+    def correlation(self) -> float:
+        denominator = math.sqrt(self.m2_x * self.m2_y)
+        return self.c / denominator if denominator else math.nan
+
+
+class Histogram:
+    """Counts over fixed edges, plus values below the first and above the last edge"""
+
+    def __init__(self, edges: np.ndarray = LOG_EDGES):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, values: np.ndarray):
+        values = values[np.isfinite(values)]
+        self.counts += np.histogram(values, self.edges)[0]
+        self.underflow += int(np.count_nonzero(values < self.edges[0]))
+        self.overflow += int(np.count_nonzero(values > self.edges[-1]))
+
+    def merge(self, other: "Histogram"):
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+
+@dataclass
+class ProfileSpec:
+    """How each column is profiled; fixed before the first chunk so all partial profiles line up"""
+    numeric: List[str]
+    text: List[str]
+    categorical: List[str] = field(default_factory=list)
+    histograms: List[str] = field(default_factory=list)
+    compression: float = 200
+    hll_precision: int = 14
+
+    @classmethod
+    def infer(cls, sample: pd.DataFrame, **kwargs) -> "ProfileSpec":
+        """Declared column types of the dataset (columnar.py), completed from the dtypes of a sample chunk"""
+        kind = dataset_kind(sample.columns)
+        declared = NUMERIC_COLUMNS.get(kind, [])
+        numeric = [c for c in sample.columns
+                   if c in declared or (pd.api.types.is_numeric_dtype(sample[c])
+                                        and not pd.api.types.is_bool_dtype(sample[c]))]
+        categorical = [c for c in sample.columns
+                       if c in CATEGORICAL_COLUMNS.get(kind, []) or isinstance(sample[c].dtype, pd.CategoricalDtype)]
+        return cls(
+            numeric=numeric,
+            text=[c for c in sample.columns if c not in numeric],
+            categorical=categorical,
+            histograms=[c for c in HISTOGRAM_COLUMNS if c in numeric],
+            **kwargs,
+        )
+
+
+class ColumnProfile:
+    def __init__(self, numeric: bool, categorical: bool, spec: ProfileSpec):
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog(spec.hll_precision)
+        # Numeric columns: value moments and quantiles; text columns: length moments
+        self.moments = Moments()
+        self.digest = TDigest(spec.compression) if numeric else None
+        self.values: Optional[Counter] = Counter() if categorical else None
+
+    def add(self, column: pd.Series):
+        self.count += len(column)
+        self.nulls += int(column.isna().sum())
+        self.distinct.add(column)
+        if self.numeric:
+            values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.add(values)
+            self.digest.add(values)
+        else:
+            lengths = column.dropna().astype(str).str.len().to_numpy(dtype=np.float64)
+            self.moments.add(lengths)
+        if self.values is not None:
+            self.values.update(column.dropna().astype(str).value_counts().to_dict())
+
+    def merge(self, other: "ColumnProfile"):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.moments.merge(other.moments)
+        if self.digest is not None:
+            self.digest.merge(other.digest)
+        if self.values is not None:
+            self.values.update(other.values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        report = {
+            "type": "numeric" if self.numeric else "text",
+            "count": self.count,
+            "nulls": self.nulls,
+            "distinct_estimate": self.distinct.estimate(),
+        }
+        if self.numeric:
+            report.update({
+                "min": _number(self.moments.min),
+                "max": _number(self.moments.max),
+                "mean": _number(self.moments.mean) if self.moments.n else None,
+                "std": _number(self.moments.std),
+                "quantiles": {f"p{round(q * 100):02d}": _number(self.digest.quantile(q)) for q in QUANTILES},
+            })
+        elif self.moments.n:
+            report.update({"mean_length": _number(self.moments.mean), "max_length": _number(self.moments.max)})
+        if self.values is not None:
+            report["distinct_values"] = len(self.values)
+            report["top_values"] = [[value, count] for value, count in self.values.most_common(TOP_VALUES)]
+        return report
+
+
+class DatasetProfile:
+    """Mergeable profile of a whole dataset, built one chunk at a time"""
+
+    def __init__(self, spec: ProfileSpec):
+        self.spec = spec
+        self.rows = 0
+        self.chunks = 0
+        self.columns = {
+            name: ColumnProfile(name in spec.numeric, name in spec.categorical, spec)
+            for name in spec.numeric + spec.text
+        }
+        self.pairs = {
+            (a, b): CoMoments() for i, a in enumerate(spec.numeric) for b in spec.numeric[i + 1:]
+        }
+        self.histograms = {name: Histogram() for name in spec.histograms}
+
+    def add(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        self.chunks += 1
+        numeric = {name: pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                   for name in self.spec.numeric if name in chunk.columns}
+        for name, column in self.columns.items():
+            if name not in chunk.columns:
+                continue
+            column.add(pd.Series(numeric[name]) if name in numeric else chunk[name])
+        for (a, b), pair in self.pairs.items():
+            if a in numeric and b in numeric:
+                pair.add(numeric[a], numeric[b])
+        for name, histogram in self.histograms.items():
+            if name in numeric:
+                histogram.add(numeric[name])
+
+    def merge(self, other: "DatasetProfile"):
+        self.rows += other.rows
+        self.chunks += other.chunks
+        for name, column in self.columns.items():
+            column.merge(other.columns[name])
+        for key, pair in self.pairs.items():
+            pair.merge(other.pairs[key])
+        for name, histogram in self.histograms.items():
+            histogram.merge(other.histograms[name])
+
+    def filter_ranges(self) -> Dict[str, Any]:
+        """Value ranges of the filterable columns, in the form the RAG indexer stores"""
+        ranges: Dict[str, Any] = {}
+        for name in FILTER_COLUMNS:
+            column = self.columns.get(name)
+            if column is None or not column.numeric or not column.moments.n:
+                continue
+            ranges[name] = {
+                "min": _number(column.moments.min),
+                "max": _number(column.moments.max),
+                **{f"p{round(q * 100):02d}": _number(column.digest.quantile(q)) for q in (0.05, 0.5, 0.95)},
+            }
+        category = self.columns.get(CATEGORY_COLUMN)
+        if category is not None and category.values is not None:
+            ranges["categories"] = [value for value, _ in category.values.most_common()]
+        return ranges
+
+    def to_dict(self) -> Dict[str, Any]:
+        correlation: Dict[str, Dict[str, Optional[float]]] = {name: {name: 1.0} for name in self.spec.numeric}
+        for (a, b), pair in self.pairs.items():
+            correlation[a][b] = correlation[b][a] = _number(pair.correlation)
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "columns": {name: column.to_dict() for name, column in self.columns.items()},
+            "correlation": correlation,
+            "histograms": {
+                name: {
+                    "edges": [float(e) for e in histogram.edges],
+                    "counts": histogram.counts.tolist(),
+                    "underflow": histogram.underflow,
+                    "overflow": histogram.overflow,
+                }
+                for name, histogram in self.histograms.items()
+            },
+            "filter_ranges": self.filter_ranges(),
+        }
+
+
+def profile_chunk(chunk: pd.DataFrame, spec: ProfileSpec) -> DatasetProfile:
+    profile = DatasetProfile(spec)
+    profile.add(chunk)
+    return profile
+
+
+def _profile_batch(path: str, index: int, spec: ProfileSpec) -> DatasetProfile:
+    """Profile one record batch, mapped by the worker itself so no chunk is pickled"""
+    return profile_chunk(read_batch(path, index), spec)
+
+
+def _bounded_map(executor: Optional[ProcessPoolExecutor], tasks: Iterable[tuple], window: int) -> Iterator[DatasetProfile]:
+    """
+    Run (function, *args) tasks in order with at most `window` in flight, so
+    chunks are read no faster than they are profiled. In-process without an executor.
+    """
+    if executor is None:
+        for fn, *args in tasks:
+            yield fn(*args)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(*task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def profile_dataset(
+    csv_path: Union[str, Path],
+    workers: Optional[int] = None,
+    chunksize: int = BATCH_ROWS,
+    spec: Optional[ProfileSpec] = None,
+) -> Dict[str, Any]:
+    """
+    Profile a dataset in one chunked pass and return the report. Reads the
+    record batches of its Arrow copy when current (each worker maps its own),
+    otherwise CSV chunks of chunksize rows. workers=1 profiles in-process.
+    """
+    start = time.perf_counter()
+    csv_path = Path(csv_path)
+    workers = workers or os.cpu_count() or 1
+    path = arrow_path(csv_path)
+    use_arrow = is_current(path, csv_path)
+    if use_arrow:
+        try:
+            batches = batch_count(path)
+        except ImportError:
+            logger.warning(f"{path} exists but pyarrow is not installed; reading {csv_path}")
+            use_arrow = False
+
+    if use_arrow:
+        source = path
+        spec = spec or ProfileSpec.infer(read_batch(path, 0))
+        tasks = ((_profile_batch, str(path), i, spec) for i in range(batches))
+    else:
+        source = csv_path
+        chunks = pd.read_csv(csv_path, chunksize=chunksize)
+        first = next(chunks)
+        spec = spec or ProfileSpec.infer(first)
+        tasks = ((profile_chunk, chunk, spec) for chunk in itertools.chain([first], chunks))
+
+    profile = DatasetProfile(spec)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for partial in _bounded_map(executor, tasks, window=2 * workers):
+            profile.merge(partial)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    report = {
+        "source": {"path": str(csv_path), "read_from": str(source), "sha256": file_digest(csv_path)},
+        "seconds": round(time.perf_counter() - start, 2),
+        "workers": workers,
+        **profile.to_dict(),
+    }
+    logger.info(f"Profiled {profile.rows} rows in {profile.chunks} chunks in {report['seconds']} s")
+    return report
+
+
+def report_path(csv_path: Union[str, Path]) -> Path:
+    return Path(csv_path).with_suffix(REPORT_SUFFIX)
+
+
+def write_report(report: Dict[str, Any], path: Union[str, Path]) -> Path:
+    path = Path(path)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def load_report(csv_path: Union[str, Path], digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    The saved report for csv_path, or None if there is none or it was computed
+    from a different version of the file (digest: its sha256, if already known).
+    """
+    path = report_path(csv_path)
+    if not path.exists():
+        return None
+    report = json.loads(path.read_text())
+    if report.get("source", {}).get("sha256") != (digest or file_digest(csv_path)):
+        logger.info(f"Ignoring {path}: it was computed from a different version of {csv_path}")
+        return None
+    return report
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Profile a dataset in one chunked, parallel pass")
+    parser.add_argument('csv_path', nargs='?', default=Path(__file__).parent.parent / 'data' / 'Product_Information_Dataset.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=BATCH_ROWS)
+    parser.add_argument('--output', default=None, type=Path, help="Defaults to <dataset>.profile.json")
+    args = parser.parse_args()
+
+    report = profile_dataset(args.csv_path, workers=args.workers, chunksize=args.chunksize)
+    output = write_report(report, args.output or report_path(args.csv_path))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s$.]")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and whitespace insensitive form used for exact matching"""
+    text = _PUNCTUATION.sub(" ", query.lower())
+    return _WHITESPACE.sub(" ", text).strip(" .")
+
+
+def numbers_in(query: str) -> tuple:
+    """Numbers in a query (IDs, prices). Queries that differ only in these embed
+    almost identically, so they make a good namespace for semantic matching."""
+    return tuple(_NUMBER.findall(query))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    namespace: Hashable
+    created: float
+    vector: Optional[np.ndarray]
+
+
+class QueryCache:
+    """
+    Two-level cache for query results.
+
+    Level one is an LRU keyed by the normalized query text. Level two compares the
+    query embedding against cached ones and returns a hit when the cosine
+    similarity is at least similarity_threshold. Semantic matches are only made
+    within the same namespace, so callers can keep queries apart that embed alike
+    but must not share answers (different customer IDs, different price filters).
+
+    Entries expire after ttl_seconds and the least recently used entry is evicted
+    beyond max_size. If version_fn is given, the whole cache is dropped whenever
+    its value changes (e.g. the product index was rebuilt).
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], Sequence[float]]] = None,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95,
+        version_fn: Optional[Callable[[], Hashable]] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, query: str, namespace: Hashable = None) -> Optional[Any]:
+        """Cached value for query, or None"""
+        key = (namespace, normalize_query(query))
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.value
+
+        if self.embed_fn is not None:
+            vector = self._embed(query)
+            with self._lock:
+                match = self._nearest(vector, namespace)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match].value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, value: Any, namespace: Hashable = None):
+        key = (namespace, normalize_query(query))
+        vector = self._embed(query) if self.embed_fn is not None else None
+        with self._lock:
+            self._check_version()
+            self._entries[key] = _Entry(value, namespace, time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl_seconds
+
+    def _check_version(self):
+        """Drop everything if the underlying data changed. Caller holds the lock."""
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def _nearest(self, vector: np.ndarray, namespace: Hashable) -> Optional[tuple]:
+        """Most similar live entry in the namespace above the threshold. Caller holds the lock."""
+        expired = [key for key, entry in self._entries.items() if self._expired(entry)]
+        for key in expired:
+            del self._entries[key]
+        candidates = [
+            (key, entry.vector) for key, entry in self._entries.items()
+            if entry.namespace == namespace and entry.vector is not None
+        ]
+        if not candidates:
+            return None
+        similarities = np.stack([v for _, v in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
@@ -1,48 +1,549 @@
+import hashlib
+import json
+import logging
+import pickle
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+import pandas as pd
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import DataFrameLoader
+from langchain_core.documents import Document
+
+from telemetry import traced
+from indexing import EmbeddingPool, IndexingStats, build_combined_content, file_digest, iter_catalog_chunks
+from profiling import load_report
+
+logger = logging.getLogger(__name__)
+
+# Text embedded for every product. Changing it invalidates the on-disk index cache.
+COMBINED_CONTENT_TEMPLATE = (
+    "Category: {main_category} | "
+    "Product: {title} | "
+    "Rating: {average_rating} stars | "
+    "Description: {description}"
+)
+
+# Bump when the layout of the cached files changes
+CACHE_FORMAT_VERSION = 3
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'ivf_sq8')
+
+
+def content_hash(text: str) -> str:
+    """Short digest used to detect products whose embedded text changed"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Rule of thumb for IVF: about 4*sqrt(n) lists, with at least 39 training points per list"""
+    return int(max(1, min(4 * np.sqrt(n_vectors), n_vectors // 39)))
+
+
+def index_factory_string(index_type: str, n_vectors: int, dim: int, nlist: Optional[int] = None,
+                         hnsw_m: int = 32, pq_m: Optional[int] = None) -> str:
+    """
+    FAISS index_factory description for one of INDEX_TYPES. Falls back to Flat
+    when there are too few vectors to train the requested index.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type '{index_type}', expected one of: {', '.join(INDEX_TYPES)}")
+    nlist = nlist or default_nlist(n_vectors)
+    if index_type == 'hnsw':
+        return f"HNSW{hnsw_m}"
+    if index_type.startswith('ivf') and n_vectors < 39 * nlist:
+        logger.warning(f"{n_vectors} vectors are too few to train IVF{nlist}, using a flat index")
+        return "Flat"
+    if index_type == 'ivf_flat':
+        return f"IVF{nlist},Flat"
+    if index_type == 'ivf_sq8':
+        return f"IVF{nlist},SQ8"
+    if index_type == 'ivf_pq':
+        # PQ codebooks need 256 centroids per sub-quantizer
+        if n_vectors < 256 * 39:
+            logger.warning(f"{n_vectors} vectors are too few to train PQ, using IVF{nlist},SQ8")
+            return f"IVF{nlist},SQ8"
+        pq_m = pq_m or next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+        return f"IVF{nlist},PQ{pq_m}"
+    return "Flat"
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str = 'flat', **params) -> faiss.Index:
+    """
+    Create and train (without adding) an index for vectors of this shape.
+    params are passed to index_factory_string.
+    """
+    n_vectors, dim = vectors.shape
+    description = index_factory_string(index_type, n_vectors, dim, **params)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if not index.is_trained:
+        start = time.perf_counter()
+        index.train(vectors)
+        logger.info(f"Trained {description} on {n_vectors} vectors in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time knobs; those that do not apply to the index type are ignored"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if ef_search and hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = ef_search
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    """
+    Whether remove_ids leaves positions 0..n-1 in order, as LangChain's FAISS.delete
+    assumes when it renumbers index_to_docstore_id. Only flat indexes compact their IDs;
+    IVF lists keep the removed vectors' IDs as gaps and HNSW cannot remove at all.
+    """
+    return isinstance(index, faiss.IndexFlat)
+
+
+def rebuild_without(index: faiss.Index, keep: Sequence[int], hnsw_m: int = 32) -> faiss.Index:
+    """
+    A copy of index holding only the vectors at positions keep, renumbered 0..len(keep)-1.
+    Trained indexes keep their training (the vectors are reconstructed and re-added,
+    so nothing is re-embedded); HNSW gets a fresh graph.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # IVF lists can only reconstruct by ID through a direct map
+        ivf.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)[np.asarray(keep, dtype=np.int64)]
+    if hasattr(index, 'hnsw'):
+        rebuilt = faiss.index_factory(index.d, f"HNSW{hnsw_m}", faiss.METRIC_L2)
+    else:
+        rebuilt = faiss.clone_index(index)
+        rebuilt.reset()
+    rebuilt.add(vectors)
+    return rebuilt
+
 
 class ProductRAG:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(
+        self,
+        model_name='all-MiniLM-L6-v2',
+        cache_dir: Optional[Union[str, Path]] = None,
+        id_column: str = 'parent_asin',
+        index_type: str = 'flat',
+        nprobe: int = 16,
+        ef_search: int = 64,
+        index_params: Optional[Dict[str, Any]] = None,
+        min_train_vectors: int = 20000,
+        embed_workers: int = 1,
+    ):
         """
         Initialize RAG with model
+
+        If cache_dir is given, the FAISS index and docstore are persisted there and
+        reused on the next start. Products are keyed by id_column so that catalog
+        changes can be applied incrementally instead of re-embedding everything.
+
+        index_type selects exact search ('flat') or an approximate index
+        ('ivf_flat', 'hnsw', 'ivf_pq', 'ivf_sq8'). Trained indexes are trained on
+        the first batch of vectors indexed, which sync_csv accumulates across chunks
+        until it holds at least min_train_vectors; nprobe and ef_search trade recall
+        for latency at query time. index_params (nlist, hnsw_m, pq_m) tune the build.
+
+        embed_workers is the number of processes create_vectorstore and sync embed
+        with; sync_csv takes its own workers argument.
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{index_type}', expected one of: {', '.join(INDEX_TYPES)}")
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.id_column = id_column
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.index_params = index_params or {}
+        self.min_train_vectors = min_train_vectors
+        self.embed_workers = embed_workers
         self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500,
             chunk_overlap=0
         )
-        
-    def create_vectorstore(self, df_products):
+        self.vectorstore = None
+        # product_id -> content_hash of the text currently embedded for it
+        self.content_hashes: Dict[str, str] = {}
+        # Price and rating ranges and categories of the catalog, from its profile report (profiling.py)
+        self.filter_ranges: Dict[str, Any] = {}
+        # Bumped on every change to the index; lets dependents drop derived state
+        self.index_version = 0
+        self._position_of: Optional[Dict[str, int]] = None
+        # Memoised so the query cache and the search share one embedding per query
+        self.embed_query = lru_cache(maxsize=1024)(self._embed_query)
+
+    def index_key(self) -> str:
         """
-        Create vectorstore from dataframe
+        Hash of what makes a cached index reusable: model, template, index type and cache layout
         """
-        df_products['combined_content'] = df_products.apply(
-            lambda row: (
-                f"Category: {row['main_category']} | "
-                f"Product: {row['title']} | "
-                f"Rating: {row['average_rating']} stars | "
-                f"Description: {row['description']}"
-            ),
-            axis=1
+        params = json.dumps(self.index_params, sort_keys=True)
+        key = (
+            f"v{CACHE_FORMAT_VERSION}|{self.model_name}|{self.id_column}|"
+            f"{self.index_type}|{params}|{COMBINED_CONTENT_TEMPLATE}"
         )
-        loader = DataFrameLoader(df_products, page_content_column='combined_content')
-        documents = loader.load()
-        
-        # Create vectorstore
-        self.vectorstore = FAISS.from_documents(
-            documents,
-            self.embeddings
-        )
-        
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def fingerprint(self, df_products: pd.DataFrame) -> str:
+        """
+        Hash of the catalog content
+        """
+        digest = hashlib.sha256()
+        digest.update(",".join(map(str, df_products.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df_products, index=True).values.tobytes())
+        return digest.hexdigest()
+
+    def _prepare(self, df_products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return a copy with combined_content and a string product_id, without duplicate IDs
+        """
+        combined_content = build_combined_content(df_products, COMBINED_CONTENT_TEMPLATE)
+        if self.id_column in df_products.columns:
+            product_ids = df_products[self.id_column].astype(str).values
+        else:
+            product_ids = df_products.index.astype(str)
+        df = df_products.assign(combined_content=combined_content, product_id=product_ids)
+        duplicated = df['product_id'].duplicated(keep='last')
+        if duplicated.any():
+            logger.warning(f"Dropping {int(duplicated.sum())} products with duplicate {self.id_column}")
+            df = df[~duplicated]
+        return df
+
+    def _documents(self, df: pd.DataFrame) -> List[Document]:
+        loader = DataFrameLoader(df, page_content_column='combined_content')
+        return loader.load()
+
+    def _embed(self, texts: List[str], pool: Optional[EmbeddingPool] = None) -> np.ndarray:
+        if pool is not None:
+            return pool.embed(texts)
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    @traced("rag.create_vectorstore")
+    def create_vectorstore(self, df_products):
+        """
+        Create vectorstore from dataframe, loading it from the cache when possible.
+        A cache built from an older version of the catalog is synced incrementally.
+        """
+        fingerprint = self.fingerprint(df_products) if self.cache_dir else None
+        manifest = self._load_cache() if self.cache_dir else None
+        if manifest is not None:
+            if manifest.get("catalog_hash") == fingerprint:
+                logger.info(f"Loaded FAISS index from cache: {self.cache_dir}")
+            else:
+                logger.info("Catalog changed since the index was cached, applying diff")
+                self.sync(df_products)
+        else:
+            self.vectorstore = None
+            self.content_hashes = {}
+            with self._embedding_pool() as pool:
+                self._upsert_prepared(self._prepare(df_products), pool)
+                logger.info(f"Built index: {pool.stats}")
+            if fingerprint:
+                self._save_cache(fingerprint)
+
         # Configure basic retriever
         self.retriever = self.vectorstore.as_retriever(
             search_kwargs={"k": 5}
         )
-    
-    def search(self, query, k=5):
+
+    def sync(self, df_products: pd.DataFrame) -> Dict[str, int]:
+        """
+        Make the index match df_products: embed new or changed products and drop
+        products that are no longer in the catalog
+        """
+        fingerprint = self.fingerprint(df_products)
+        df = self._prepare(df_products)
+        removed = set(self.content_hashes) - set(df['product_id'])
+        stats = {"deleted": self.delete(removed, save=False)}
+        with self._embedding_pool() as pool:
+            stats.update(self._upsert_prepared(df, pool))
+        if self.cache_dir:
+            self._save_cache(fingerprint)
+        logger.info(f"Index sync: {stats}")
+        return stats
+
+    def upsert(self, df_products: pd.DataFrame) -> Dict[str, int]:
+        """
+        Add or update the given products. Only rows whose combined_content changed
+        are re-embedded.
+        """
+        stats = self._upsert_prepared(self._prepare(df_products))
+        if self.cache_dir:
+            self._save_cache(None)
+        return stats
+
+    def _embedding_pool(self) -> EmbeddingPool:
+        """Length-bucketed batches, on embed_workers processes"""
+        return EmbeddingPool(self.model_name, workers=self.embed_workers, embeddings=self.embeddings)
+
+    def _upsert_prepared(self, df: pd.DataFrame, pool: Optional[EmbeddingPool] = None) -> Dict[str, int]:
+        hashes = df['combined_content'].map(content_hash)
+        known = df['product_id'].map(self.content_hashes)
+        changed = known.notna() & (known != hashes)
+        added = known.isna()
+        to_embed = df[changed | added]
+        if to_embed.empty:
+            return {"added": 0, "updated": 0}
+
+        documents = self._documents(to_embed)
+        ids = to_embed['product_id'].tolist()
+        vectors = self._embed([doc.page_content for doc in documents], pool)
+        text_embeddings = list(zip((doc.page_content for doc in documents), vectors))
+        metadatas = [doc.metadata for doc in documents]
+        if self.vectorstore is None:
+            index = build_faiss_index(vectors, self.index_type, **self.index_params)
+            set_search_params(index, self.nprobe, self.ef_search)
+            self.vectorstore = FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+            )
+        elif changed.any():
+            self._remove(df.loc[changed, 'product_id'].tolist())
+        self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self.content_hashes.update(zip(ids, hashes[changed | added]))
+        self._mutated()
+        return {"added": int(added.sum()), "updated": int(changed.sum())}
+
+    def sync_csv(
+        self,
+        csv_path: Union[str, Path],
+        chunksize: int = 2000,
+        workers: Optional[int] = None,
+        tokens_per_batch: Optional[int] = None,
+    ) -> IndexingStats:
+        """
+        Build or update the index by streaming the catalog CSV in chunks and
+        embedding new or changed products on a process pool. Only one chunk is
+        held in memory at a time, except while a new IVF index collects its
+        training sample (min_train_vectors rows). Filter ranges are taken from the catalog's
+        profile report when one was computed for this version of the file.
+        """
+        start = time.perf_counter()
+        digest = file_digest(csv_path)
+        fingerprint = "file:" + digest
+        manifest = self._load_cache() if self.cache_dir else None
+        self.load_filter_ranges(csv_path, digest=digest)
+        if manifest is not None and manifest.get("catalog_hash") == fingerprint:
+            logger.info(f"Loaded FAISS index from cache: {self.cache_dir}")
+            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 5})
+            return IndexingStats()
+        if manifest is None:
+            self.vectorstore = None
+            self.content_hashes = {}
+
+        # Changed and removed products are found by hashing alone and dropped in one
+        # go, so IVF and HNSW indexes are rebuilt once rather than once per chunk
+        if manifest is not None:
+            self.delete(self._stale_products(csv_path, chunksize), save=False)
+
+        pool_kwargs = {"tokens_per_batch": tokens_per_batch} if tokens_per_batch else {}
+        buffered: List[pd.DataFrame] = []
+        with EmbeddingPool(self.model_name, workers=workers, embeddings=self.embeddings, **pool_kwargs) as pool:
+            for chunk in iter_catalog_chunks(csv_path, chunksize=chunksize):
+                buffered.append(self._prepare(chunk))
+                pool.stats.chunks += 1
+                # An untrained IVF index waits for a training sample spanning several chunks
+                if self._needs_training() and sum(len(df) for df in buffered) < self.min_train_vectors:
+                    continue
+                self._upsert_buffered(buffered, pool)
+                buffered = []
+            if buffered:
+                self._upsert_buffered(buffered, pool)
+            stats = pool.stats
+        stats.total_seconds = time.perf_counter() - start
+        logger.info(f"Indexed catalog: {stats}")
+
+        if self.cache_dir:
+            self._save_cache(fingerprint)
+        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 5})
+        return stats
+
+    def load_filter_ranges(self, csv_path: Union[str, Path], digest: Optional[str] = None) -> bool:
+        """Take the filter ranges from the catalog's profile report, if one exists for this version of the file"""
+        report = load_report(csv_path, digest=digest)
+        if report is None:
+            return False
+        self.filter_ranges = report.get("filter_ranges", {})
+        return True
+
+    def _needs_training(self) -> bool:
+        return self.vectorstore is None and self.index_type.startswith('ivf')
+
+    def _upsert_buffered(self, prepared: List[pd.DataFrame], pool: EmbeddingPool):
+        df = pd.concat(prepared, ignore_index=True) if len(prepared) > 1 else prepared[0]
+        # A product repeated across chunks keeps its last occurrence, as in _prepare
+        df = df[~df['product_id'].duplicated(keep='last')]
+        self._upsert_prepared(df, pool)
+
+    def _stale_products(self, csv_path: Union[str, Path], chunksize: int) -> List[str]:
+        """Indexed products whose text changed or that are no longer in the CSV"""
+        current: Dict[str, str] = {}
+        for chunk in iter_catalog_chunks(csv_path, chunksize=chunksize):
+            df = self._prepare(chunk)
+            current.update(zip(df['product_id'], df['combined_content'].map(content_hash)))
+        return [pid for pid, known in self.content_hashes.items() if current.get(pid) != known]
+
+    def delete(self, product_ids: Iterable[str], save: bool = True) -> int:
+        """
+        Remove products from the index and docstore
+        """
+        product_ids = [str(pid) for pid in product_ids if str(pid) in self.content_hashes]
+        if not product_ids:
+            return 0
+        self._remove(product_ids)
+        for pid in product_ids:
+            del self.content_hashes[pid]
+        self._mutated()
+        if save and self.cache_dir:
+            self._save_cache(None)
+        return len(product_ids)
+
+    def _mutated(self):
+        self.index_version += 1
+        self._position_of = None
+
+    def _remove(self, product_ids: List[str]):
+        """
+        Drop products from the FAISS index and docstore. Indexes other than flat
+        ones cannot remove vectors without leaving gaps in their positions, so the
+        remaining vectors are re-inserted into a fresh copy; this costs no re-embedding.
+        """
+        if supports_remove(self.vectorstore.index):
+            self.vectorstore.delete(product_ids)
+            return
+        store = self.vectorstore
+        removed = set(product_ids)
+        keep = [pos for pos, pid in sorted(store.index_to_docstore_id.items()) if pid not in removed]
+        index = rebuild_without(store.index, keep, hnsw_m=self.index_params.get('hnsw_m', 32))
+        set_search_params(index, self.nprobe, self.ef_search)
+        store.docstore.delete(product_ids)
+        store.index_to_docstore_id = {new: store.index_to_docstore_id[old] for new, old in enumerate(keep)}
+        store.index = index
+
+    def _save_cache(self, fingerprint: Optional[str]):
+        """
+        Persist index, docstore and manifest. The manifest is written last so an
+        interrupted save is never mistaken for a valid cache. A None fingerprint
+        means the index no longer matches a known catalog and will be synced on load.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.cache_dir / 'manifest.json'
+        manifest_path.unlink(missing_ok=True)
+        self.vectorstore.save_local(str(self.cache_dir))
+        (self.cache_dir / 'content_hashes.json').write_text(json.dumps(self.content_hashes))
+        manifest = {
+            "index_key": self.index_key(),
+            "catalog_hash": fingerprint,
+            "model_name": self.model_name,
+            "format_version": CACHE_FORMAT_VERSION,
+            "filter_ranges": self.filter_ranges,
+        }
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    def _load_cache(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the index from the cache if it was built with the same model and
+        template. Returns the manifest, or None if nothing was loaded. The index
+        and the docstore are read fully into memory: this saves re-embedding the
+        catalog, not memory.
+        """
+        manifest_path = self.cache_dir / 'manifest.json'
+        index_path = self.cache_dir / 'index.faiss'
+        docstore_path = self.cache_dir / 'index.pkl'
+        hashes_path = self.cache_dir / 'content_hashes.json'
+        if not all(p.exists() for p in (manifest_path, index_path, docstore_path, hashes_path)):
+            return None
+        try:
+            manifest = json.loads(manifest_path.read_text())
+            if manifest.get("index_key") != self.index_key():
+                logger.info("FAISS cache was built with a different model or template, rebuilding index")
+                return None
+            index = faiss.read_index(str(index_path))
+            set_search_params(index, self.nprobe, self.ef_search)
+            # The docstore is written by FAISS.save_local from this same application
+            with open(docstore_path, 'rb') as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            content_hashes = json.loads(hashes_path.read_text())
+        except Exception as e:
+            logger.warning(f"Could not load FAISS cache, rebuilding index: {e}")
+            return None
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+        self.content_hashes = content_hashes
+        self.filter_ranges = manifest.get("filter_ranges") or {}
+        self._mutated()
+        return manifest
+
+    @traced("rag.search")
+    def search(self, query, k=5, product_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Return (product_id, L2 distance) pairs for the k nearest products, closest first.
+        If product_ids is given, only those products are scored.
+        """
+        vector = self.embed_query(query)[None, :]
+        index = self.vectorstore.index
+        if product_ids is None:
+            distances, positions = index.search(vector, k)
+        else:
+            allowed = self.positions(product_ids)
+            if not len(allowed):
+                return []
+            # Keep a reference to the selector for the duration of the search
+            selector = faiss.IDSelectorBatch(len(allowed), faiss.swig_ptr(allowed))
+            params = self._search_parameters(selector)
+            distances, positions = index.search(vector, min(k, len(allowed)), params=params)
+        index_to_id = self.vectorstore.index_to_docstore_id
+        return [
+            (index_to_id[int(position)], float(distance))
+            for position, distance in zip(positions[0], distances[0])
+            if position != -1
+        ]
+
+    @traced("rag.embed_query")
+    def _embed_query(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vector.setflags(write=False)
+        return vector
+
+    def positions(self, product_ids: Iterable[str]) -> np.ndarray:
+        """FAISS positions of the given products, skipping unknown ones"""
+        if self._position_of is None:
+            self._position_of = {pid: pos for pos, pid in self.vectorstore.index_to_docstore_id.items()}
+        position_of = self._position_of
+        return np.fromiter(
+            (position_of[pid] for pid in product_ids if pid in position_of),
+            dtype=np.int64,
+        )
+
+    def _search_parameters(self, selector) -> faiss.SearchParameters:
+        """Search parameters restricted to selector, matching the index type's knobs"""
+        index = self.vectorstore.index
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        if hasattr(index, 'hnsw'):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+
+    def search_documents(self, query, k=5) -> List[Document]:
         """
         Search for relevant documents
         """
-        return self.retriever.get_relevant_documents(query)
\ No newline at end of file
+        return self.vectorstore.similarity_search(query, k=k)
@@ -1,5 +1,5 @@
 import streamlit as st
-from chatbot.core import EcommerceAssistant, chatbot_response, clear_conversation
+from chatbot.core import AssistantEngine, EcommerceAssistant, chatbot_stream, clear_conversation
 import time
 
 # Page configuration
@@ -15,11 +15,17 @@ if "messages" not in st.session_state:
 if "assistant" not in st.session_state:
     st.session_state.assistant = None
 
-# Initialize the assistant without cache to control the spinner
+# The model, FAISS index, product data and API/LLM clients are loaded once per
+# process and shared by every browser session. Products load in the background,
+# so the page and order questions are available straight away.
+@st.cache_resource(show_spinner="Starting the assistant...")
+def get_engine():
+    return AssistantEngine(background=True)
+
+# Each session only holds its own conversation state
 def create_assistant():
     if st.session_state.assistant is None:
-        with st.spinner("Creating assistant and loading RAG, please wait..."):
-            st.session_state.assistant = EcommerceAssistant()
+        st.session_state.assistant = EcommerceAssistant(engine=get_engine())
     return st.session_state.assistant
 
 # Title and description
@@ -46,17 +52,34 @@ if prompt := st.chat_input("What can I help you with today?"):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get assistant response
+    # Stream the assistant response as it is generated
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            assistant = create_assistant()
-            response = chatbot_response(prompt, assistant)
-            st.markdown(response)
-            # Add assistant response to history
-            st.session_state.messages.append({"role": "assistant", "content": response})
+        assistant = create_assistant()
+        progress = st.empty()
+        progress.caption("Thinking...")
+
+        def answer_tokens():
+            for event in chatbot_stream(prompt, assistant):
+                if event["type"] == "tool_start":
+                    progress.caption(f"Running {event['tool']}...")
+                elif event["type"] == "token":
+                    progress.empty()
+                    yield event["text"]
+                elif event["type"] == "done":
+                    st.session_state.last_ttft_ms = event["ttft_ms"]
+
+        response = st.write_stream(answer_tokens())
+        # Add assistant response to history
+        st.session_state.messages.append({"role": "assistant", "content": response})
 
 # Sidebar with additional information
 with st.sidebar:
+    engine = get_engine()
+    if engine.warmup_error:
+        st.error("Product search failed to load; order questions still work.")
+    elif not engine.is_ready:
+        st.info("Product search is still loading; order questions already work.")
+
     st.header("📝 Example Questions")
     st.markdown("""
     You can ask things like:
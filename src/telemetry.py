@@ -0,0 +1,372 @@
+"""
+Lightweight tracing and metrics shared by the assistant, the RAG layer, the order
+client and the two APIs.
+
+- span(name, **attributes) / @traced(name): time a stage; durations go into the
+  span_duration_seconds histogram (labelled by span) and, if configured, to an
+  exporter
+- count(name, value, **labels) / observe(name, value, **labels): counters and histograms
+- register_gauge(name, fn, **labels): values read when metrics are rendered
+
+Exposed as Prometheus text (render_prometheus, or start_http_server for processes
+without a web framework). Spans can also be written as JSON lines to a file or
+forwarded to an OpenTelemetry collector. Configured from the environment:
+
+    TELEMETRY_ENABLED=0                 turn everything off
+    TELEMETRY_EXPORT=file:spans.jsonl   append finished spans to a file
+    TELEMETRY_EXPORT=otlp               forward spans via opentelemetry-sdk (OTLP exporter)
+    METRICS_PORT=9100                   serve /metrics from a background thread
+
+Recording a span costs two perf_counter calls, a contextvar set/reset and one
+locked histogram update, so it can stay on in production.
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    def load_dotenv():
+        return False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Span:
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start", "start_ns", "duration")
+
+    def __init__(self, name: str, attributes: Dict[str, Any], parent: Optional["Span"]):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class FileExporter:
+    """Finished spans as JSON lines, written in batches"""
+
+    def __init__(self, path: str, batch_size: int = 100):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) < self.batch_size:
+                return
+            lines, self._buffer = self._buffer, []
+        self._write(lines)
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        self._write(lines)
+
+    def _write(self, lines: List[str]):
+        if lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+class OTelExporter:
+    """
+    Replays finished spans through the OpenTelemetry SDK (requires opentelemetry-sdk).
+    Spans are exported as they finish, children before parents, so the local trace
+    and parent IDs travel as attributes rather than as OTel context.
+    """
+
+    def __init__(self, service_name: str):
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        self.tracer = provider.get_tracer(__name__)
+
+    def export(self, span: Span):
+        attributes = {k: str(v) for k, v in span.attributes.items()}
+        attributes.update({"local.trace_id": span.trace_id, "local.parent_id": span.parent_id or ""})
+        otel_span = self.tracer.start_span(span.name, start_time=span.start_ns, attributes=attributes)
+        otel_span.end(end_time=span.start_ns + int(span.duration * 1e9))
+
+
+class Telemetry:
+    def __init__(self, enabled: bool = True, exporter=None):
+        self.enabled = enabled
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.gauges: List[Tuple[str, LabelKey, Callable[[], float]]] = []
+
+    @classmethod
+    def from_env(cls, service_name: str = "ecommerce-assistant") -> "Telemetry":
+        enabled = os.getenv("TELEMETRY_ENABLED", "1").lower() not in ("0", "false", "no")
+        target = os.getenv("TELEMETRY_EXPORT", "")
+        exporter = None
+        if enabled and target.startswith("file:"):
+            exporter = FileExporter(target[len("file:"):])
+        elif enabled and target == "otlp":
+            try:
+                exporter = OTelExporter(os.getenv("OTEL_SERVICE_NAME", service_name))
+            except ImportError:
+                logger.warning("TELEMETRY_EXPORT=otlp needs opentelemetry-sdk and the OTLP exporter; spans are not exported")
+        telemetry = cls(enabled=enabled, exporter=exporter)
+        port = os.getenv("METRICS_PORT")
+        if enabled and port:
+            telemetry.start_http_server(int(port))
+        return telemetry
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_gauge(self, name: str, fn: Callable[[], float], **labels):
+        self.gauges.append((name, _label_key(labels), fn))
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, attributes, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            _current_span.reset(token)
+            self.observe("span_duration_seconds", span.duration, span=name)
+            if "error" in span.attributes:
+                self.count("span_errors_total", span=name)
+            if self.exporter is not None:
+                try:
+                    self.exporter.export(span)
+                except Exception as e:
+                    logger.debug(f"Exporting span {name} failed: {e}")
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator running the function inside a span (named after it by default)"""
+        def decorator(fn):
+            span_name = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, mean and approximate p50/p99 of every span, in milliseconds"""
+        with self._lock:
+            series = dict(self.histograms.get("span_duration_seconds", {}))
+        result = {}
+        for key, histogram in series.items():
+            name = dict(key)["span"]
+            result[name] = {
+                "count": histogram.count,
+                "mean_ms": round(histogram.sum / histogram.count * 1000, 3) if histogram.count else None,
+                "p50_le_ms": (histogram.quantile(0.5) or 0) * 1000,
+                "p99_le_ms": (histogram.quantile(0.99) or 0) * 1000,
+            }
+        return result
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = 'le="%s"' % bound
+                        lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                    le = 'le="+Inf"'
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        typed = set()
+        for name, key, fn in self.gauges:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "0.0.0.0"):
+        """Serve /metrics from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = telemetry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+# Process-wide instance used by the module-level helpers. Modules import this one
+# before their own load_dotenv(), so read .env here first.
+load_dotenv()
+telemetry = Telemetry.from_env()
+
+span = telemetry.span
+traced = telemetry.traced
+count = telemetry.count
+observe = telemetry.observe
+register_gauge = telemetry.register_gauge
+render_prometheus = telemetry.render_prometheus
+
+
+def instrument_fastapi(app, service: str, metrics_path: str = "/metrics"):
+    """
+    Time every request of a FastAPI app by route template, method and status, and
+    serve the metrics in Prometheus format at metrics_path
+    """
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def record_request(request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            # Route templates keep label cardinality bounded (not /customer/37077)
+            path = getattr(route, "path", "unmatched")
+            if path != metrics_path:
+                labels = {"service": service, "route": path, "method": request.method, "status": status}
+                observe("http_request_duration_seconds", time.perf_counter() - start, **labels)
+
+    @app.get(metrics_path, include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("pandas")
+from hybrid_search import parse_filters
+
+
+@pytest.mark.parametrize("query, min_price", [
+    ("microphones over 100 dollars", 100.0),
+    ("guitars above $250", 250.0),
+    ("amps at least 80", 80.0),
+])
+def test_min_price_with_or_without_dollar_sign(query, min_price):
+    assert parse_filters(query).min_price == min_price
+
+
+@pytest.mark.parametrize("query", ["headphones rated over 4 stars", "more than 4.5 stars"])
+def test_star_counts_are_not_prices(query):
+    filters = parse_filters(query)
+    assert filters.min_price is None
+    assert filters.min_rating is not None
+
+
+RANGES = {
+    "price": {"min": 0.5, "max": 2500.0},
+    "average_rating": {"min": 1.0, "max": 5.0},
+    "categories": ["Musical Instruments", "All Electronics"],
+}
+
+
+def test_bounds_outside_the_catalog_range_are_dropped():
+    filters = parse_filters("guitars under $5000 over $0.10 with 1 star or more", ranges=RANGES)
+    assert filters.max_price is None
+    assert filters.min_price is None
+    assert filters.min_rating is None
+
+
+def test_bounds_inside_the_catalog_range_are_kept():
+    filters = parse_filters("guitars between $100 and $300 with 4 stars", ranges=RANGES)
+    assert (filters.min_price, filters.max_price, filters.min_rating) == (100.0, 300.0, 4.0)
+
+
+def test_profile_categories_are_used_when_none_are_given():
+    assert parse_filters("best musical instruments", ranges=RANGES).categories == ["Musical Instruments"]
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+from chatbot.memory import ConversationMemory
+
+
+@pytest.fixture
+def memory():
+    return ConversationMemory("You are a helpful assistant.")
+
+
+@pytest.mark.parametrize("text", [
+    "a video card under 300 dollars",
+    "can I order 2000 guitar picks?",
+    "I want to order a mic under 150",
+    "best rated guide 2024",
+    "I'm considering 250 picks",
+    "show me orders from 2019",
+])
+def test_numbers_that_are_not_ids_are_not_remembered(memory, text):
+    memory.add_user(text)
+    assert not memory.entities["customer_ids"]
+    assert "customer ids" not in memory.context()
+
+
+def test_named_customer_ids_are_remembered(memory):
+    memory.add_user("my customer id is 41066")
+    memory.add_user("and what about customer 37077?")
+    assert list(memory.entities["customer_ids"]) == ["41066", "37077"]
+    assert "customer ids: 41066, 37077" in memory.context()
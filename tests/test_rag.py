@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_huggingface")
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import rag
+from rag import ProductRAG, build_faiss_index, rebuild_without, supports_remove
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(rag, "HuggingFaceEmbeddings", lambda model_name: DeterministicFakeEmbedding(size=16))
+
+
+def catalog(n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'parent_asin': [f"P{i}" for i in range(n)],
+        'main_category': ["Musical Instruments"] * n,
+        'title': [f"Product {i}" for i in range(n)],
+        'average_rating': [4.0] * n,
+        'description': [f"Description of product {i}" for i in range(n)],
+    })
+
+
+def test_ivf_rebuild_renumbers_remaining_vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 16)).astype(np.float32)
+    index = build_faiss_index(vectors, 'ivf_flat', nlist=8)
+    index.add(vectors)
+    assert not supports_remove(index)
+
+    rebuilt = rebuild_without(index, np.arange(3, 2000))
+    rebuilt.nprobe = 8
+    _, positions = rebuilt.search(vectors[[6]], 1)
+    # Original vector 6 is the 4th remaining one
+    assert positions[0][0] == 3
+    assert rebuilt.ntotal == 1997
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_search_after_delete_and_update_returns_right_products(fake_embeddings, index_type):
+    df = catalog(200)
+    store = ProductRAG(index_type=index_type, index_params={"nlist": 4})
+    store.create_vectorstore(df)
+
+    store.delete(["P0", "P1", "P2"])
+    updated = df.iloc[[10]].assign(description="A completely new description")
+    store.upsert(updated)
+
+    for pid in ["P6", "P150", "P199"]:
+        text = store._prepare(df[df['parent_asin'] == pid])['combined_content'].iloc[0]
+        assert store.search(text, k=1)[0][0] == pid
+    new_text = store._prepare(updated)['combined_content'].iloc[0]
+    assert store.search(new_text, k=1)[0][0] == "P10"
+    assert store.vectorstore.index.ntotal == 197
+    assert not {"P0", "P1", "P2"} & {pid for pid, _ in store.search("Product", k=197)}
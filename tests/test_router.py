@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("numpy")
+from chatbot.router import IntentRouter
+
+
+@pytest.fixture
+def router():
+    # Keyword rules only; no embedding model needed
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("query", [
+    "I want to order a mic under 150",
+    "show me orders over $500",
+    "show me orders over 5000",
+    "can I order 2000 guitar picks?",
+    "find a guitar for 1500 dollars",
+    "are there 4.5 stars or better orders",
+    "show me orders from 2019",
+    "are my orders from 2018 shipped",
+    "orders placed since 2020",
+])
+def test_amounts_and_quantities_are_not_customer_ids(router, query):
+    assert router.route(query).tool != "get_order"
+
+
+@pytest.mark.parametrize("query", [
+    "what high priority shipping options do you have",
+    "is there high priority delivery for orders?",
+    "I need a low priority fix for my amp",
+])
+def test_priority_outside_order_lookups_is_not_routed(router, query):
+    assert router.route(query).tool != "get_orders_by_priority"
+
+
+@pytest.mark.parametrize("query, customer_id", [
+    ("what's the status of customer id 37077", "37077"),
+    ("my customer number is 41066.", "41066"),
+    ("order #452", "452"),
+    ("show me the orders of customer 37077", "37077"),
+    ("I'd like to order 3 guitars, my customer id is 41066", "41066"),
+    ("customer id 2019", "2019"),
+])
+def test_named_customer_ids_are_routed(router, query, customer_id):
+    route = router.route(query)
+    assert route.tool == "get_order"
+    assert route.tool_input == {"customer_id": customer_id}
+
+
+@pytest.mark.parametrize("query, priority", [
+    ("show high priority orders", "high"),
+    ("orders with critical priority", "critical"),
+    ("which orders have priority: low", "low"),
+])
+def test_order_priorities_are_routed(router, query, priority):
+    route = router.route(query)
+    assert route.tool == "get_orders_by_priority"
+    assert route.tool_input == {"priority": priority}
+
+
+@pytest.mark.parametrize("query", [
+    "I want to order a mic under 150",
+    "orders above 2500 please",
+    "where are my orders from 2019",
+])
+def test_classifier_does_not_take_thresholds_as_customer_ids(query):
+    assert IntentRouter._tool_input("get_order", query) is None
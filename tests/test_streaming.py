@@ -0,0 +1,29 @@
+import queue
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.messages import HumanMessage
+
+from chatbot.fake_llm import FakeChatModel
+from chatbot.streaming import AgentStreamHandler
+
+# A prompt the fake model answers with a Final Answer blob quoting the observation
+AGENT_PROMPT = (
+    "Respond with an Action: either a tool or \"Final Answer\".\n"
+    "This was your previous work\nObservation: a red electric guitar\nThought:"
+)
+
+
+def test_final_answer_tokens_are_streamed_through_the_handler():
+    events = queue.Queue()
+    handler = AgentStreamHandler(events)
+    llm = FakeChatModel(latency_ms=0, token_delay_ms=0)
+
+    llm.invoke([HumanMessage(content=AGENT_PROMPT)], config={"callbacks": [handler]})
+
+    tokens = [event["text"] for event in list(events.queue) if event["type"] == "token"]
+    # One event per streamed token, not the whole answer once the call has finished
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Here is what I found: a red electric guitar"
+    assert handler.streamed